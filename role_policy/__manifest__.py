@@ -9,7 +9,7 @@
     "website": "https://github.com/OCA/role-policy",
     "category": "Tools",
     "depends": ["mail", "report_xlsx_helper"],
-    "external_dependencies": {"python": ["lxml", "xlrd"]},
+    "external_dependencies": {"python": ["lxml", "openpyxl", "xlrd"]},
     "maintainers": ["luc-demeyer"],
     "post_init_hook": "post_init_hook",
     "data": [
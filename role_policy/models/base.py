@@ -27,10 +27,21 @@ class BaseModel(models.AbstractModel):
         ]
 
     def _get_role_policy_group_keep_ids(self):
-        group_user = self.env.ref("base.group_user")
-        keep_ids = [
-            self.env.ref(x).id for x in self._role_policy_untouchable_groups()
-        ] + [group_user.id]
+        """
+        Return the ids of the untouchable groups as a frozenset.
+
+        The ids are resolved once per registry and hence only recomputed
+        after the installation or upgrade of modules.
+        """
+        keep_ids = getattr(self.pool, "_role_policy_group_keep_ids", None)
+        if keep_ids is None:
+            group_user = self.env.ref("base.group_user")
+            keep_ids = frozenset(
+                [self.env.ref(x).id for x in self._role_policy_untouchable_groups()]
+                + [group_user.id]
+            )
+            if self.pool.ready:
+                self.pool._role_policy_group_keep_ids = keep_ids
         return keep_ids
 
     @api.model
@@ -41,21 +52,13 @@ class BaseModel(models.AbstractModel):
         user = self.env.user
         if (
             user.exclude_from_role_policy
-            or user == self.env.ref("base.public_user")
+            or user.id == self.env["ir.model.data"].xmlid_to_res_id("base.public_user")
             or config.get("test_enable")
         ):
             return super().user_has_groups(groups)
 
-        role_groups = []
-        for group_ext_id in groups.split(","):
-            xml_id = group_ext_id[0] == "!" and group_ext_id[1:] or group_ext_id
-            if xml_id in self._role_policy_untouchable_groups():
-                role_groups.append(group_ext_id)
-            else:
-                group = self.env.ref(xml_id)
-                if group.role:
-                    role_groups.append(group_ext_id)
+        role_groups = self.env["res.groups"]._role_policy_filter_groups(groups)
         if not role_groups:
             return True
         else:
-            return super().user_has_groups(",".join(role_groups))
+            return super().user_has_groups(role_groups)
@@ -55,3 +55,42 @@ def play_odoo_x2x_commands_on_ids(in_ids, commands):
         else:  # 0, 1, 2
             raise NotImplementedError
     return result_ids
+
+
+def play_odoo_x2x_create_commands(commands):
+    """
+    Returns the existing ids linked by the commands of a create and
+    a flag indicating if the commands create new records.
+    """
+    result_ids = set()
+    has_new = False
+    for command in commands or []:
+        if command[0] == 0:
+            has_new = True
+        elif command[0] == 2:
+            result_ids -= {command[1]}
+        elif command[0] in (3, 4, 5, 6):
+            result_ids = play_odoo_x2x_commands_on_ids(result_ids, [command])
+    return result_ids, has_new
+
+
+def select_rules_by_priority(rules, signature_fields, roles_nbr):
+    """
+    Returns the ids of the rules with the highest priority.
+
+    The rules are grouped by signature. Only the signatures defined for
+    every role of the user are retained since no rule for one of the user
+    roles is considered highest priority.
+
+    :param rules: list of dicts with the rule id, priority and signature fields
+    """
+    rules_dict = {}
+    for rule in rules:
+        key = tuple(rule[f] for f in signature_fields)
+        rules_dict.setdefault(key, []).append(rule)
+    rule_ids = []
+    for key_rules in rules_dict.values():
+        if len(key_rules) != roles_nbr:
+            continue
+        rule_ids.append(min(key_rules, key=lambda r: r["priority"])["id"])
+    return rule_ids
@@ -4,7 +4,8 @@
 import logging
 from collections import defaultdict
 
-from odoo import api, fields, models
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import AccessError, MissingError
 
 _logger = logging.getLogger(__name__)
 
@@ -13,38 +14,98 @@ class IrActionsActions(models.Model):
     _name = "ir.actions.actions"
     _inherit = ["ir.actions.actions", "role.policy.menu.action.common"]
 
-    def __getattribute__(self, item):
+    @api.model
+    def get_bindings(self, model_name):
+        if self.env.user.exclude_from_role_policy:
+            return self._get_bindings_user_admin(model_name)
+        return self._get_bindings_role_policy(model_name)
+
+    def _role_policy_effective_groups(self):
         """
-        ignore role groups for the 'exclude_from_role_policy' users
+        Return the groups of the action which apply to the current user.
+        The role groups are ignored for user_root and user_admin.
         """
-        res = super().__getattribute__(item)
-        if item == "groups_id" and self.env.user.exclude_from_role_policy:
-            res = res.filtered(lambda r: not r.role)
-        return res
+        self.ensure_one()
+        groups = self.env["res.groups"]
+        if "groups_id" in self._fields:
+            groups = self.groups_id
+            if self.env.user.exclude_from_role_policy:
+                groups = groups.filtered(lambda r: not r.role)
+        return groups
 
     @api.model
-    def get_bindings(self, model_name):
+    @tools.ormcache(
+        "frozenset(self.env.user.groups_id.ids)",
+        "self.env.user._get_enabled_role_ids()",
+        "model_name",
+    )
+    def _get_bindings_role_policy(self, model_name):
+        """
+        Keep only the bindings granted by the enabled roles of the user.
+        The cache is cleared when actions or roles are updated.
+        """
         res = super().get_bindings(model_name)
-        if not self.env.user.exclude_from_role_policy:
-            user_roles = self.env.user.enabled_role_ids or self.env.user.role_ids
-            user_groups = user_roles.mapped("group_id")
-            user_role_ids = set(user_roles.ids)
-            for group in self._role_policy_untouchable_groups():
-                user_groups += self.env.ref(group)
-            res_roles = defaultdict(list)
-            for k in res:
-                res_roles[k] = []
-                for v in res[k]:
-                    if v["type"] == "ir.actions.client":
-                        if set(v["role_ids"]) & user_role_ids:
-                            res_roles[k].append(v)
-                    elif v.get("groups_id"):
-                        for group_id in v["groups_id"]:
-                            if group_id in user_groups.ids and v not in res_roles[k]:
-                                res_roles[k].append(v)
-                                continue
-            return res_roles
-        return res
+        user_role_ids = self.env.user._get_enabled_role_ids()
+        user_roles = self.env["res.role"].browse(user_role_ids)
+        user_group_ids = set(user_roles.mapped("group_id").ids)
+        user_group_ids.update(self._get_role_policy_group_keep_ids())
+        res_roles = defaultdict(list)
+        for k in res:
+            res_roles[k] = []
+            for v in res[k]:
+                if v["type"] == "ir.actions.client":
+                    if user_role_ids.intersection(v["role_ids"]):
+                        res_roles[k].append(v)
+                elif user_group_ids.intersection(v.get("groups_id") or []):
+                    res_roles[k].append(v)
+        return res_roles
+
+    @api.model
+    @tools.ormcache("frozenset(self.env.user.groups_id.ids)", "model_name")
+    def _get_bindings_user_admin(self, model_name):
+        """
+        Same logic as in base/models/ir_actions.py but we ignore
+        the role groups for user_root and user_admin.
+        """
+        cr = self.env.cr
+        IrModelAccess = self.env["ir.model.access"]
+
+        # discard unauthorized actions, and read action definitions
+        result = defaultdict(list)
+        user_groups = self.env.user.groups_id
+        self.flush()
+        cr.execute(
+            """
+            SELECT a.id, a.type, a.binding_type
+              FROM ir_actions a, ir_model m
+              WHERE m.model=%s AND a.binding_model_id=m.id
+              ORDER BY a.id
+            """,
+            [model_name],
+        )
+        for action_id, action_model, binding_type in cr.fetchall():
+            try:
+                action = self.env[action_model].browse(action_id)
+                action_groups = action._role_policy_effective_groups()
+                action_res_model = getattr(action, "res_model", False)
+                if action_groups and not action_groups & user_groups:
+                    # the user may not perform this action
+                    continue
+                if action_res_model and not IrModelAccess.check(
+                    action_res_model, mode="read", raise_exception=False
+                ):
+                    # the user won't be able to read records
+                    continue
+                result[binding_type].append(action.read()[0])
+            except (AccessError, MissingError):
+                continue
+
+        # sort actions by their sequence if sequence available
+        if result.get("action"):
+            result["action"] = sorted(
+                result["action"], key=lambda vals: vals.get("sequence", 0)
+            )
+        return result
 
 
 class IrActionsActWindow(models.Model):
@@ -82,6 +143,31 @@ class IrActionsServer(models.Model):
         string="Roles",
     )
 
+    def run(self):
+        """
+        The role groups of the actions are ignored for user_root and user_admin.
+        """
+        if not self.env.user.exclude_from_role_policy:
+            return super().run()
+        res = False
+        for action in self:
+            action_groups = action._role_policy_effective_groups()
+            if action_groups == action.groups_id:
+                res = super(IrActionsServer, action).run()
+                continue
+            if action_groups and not (action_groups & self.env.user.groups_id):
+                raise AccessError(
+                    _("You don't have enough access rights to run this action.")
+                )
+            # the standard group check only sees the groups without role
+            field = self._fields["groups_id"]
+            self.env.cache.set(action, field, action_groups._ids)
+            try:
+                res = super(IrActionsServer, action).run()
+            finally:
+                self.env.cache.invalidate([(field, action.ids)])
+        return res
+
 
 class IrActionsReport(models.Model):
     _inherit = "ir.actions.report"
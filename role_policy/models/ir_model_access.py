@@ -3,11 +3,11 @@
 
 import logging
 
-from odoo import api, models
+from odoo import api, models, tools
 
 _logger = logging.getLogger(__name__)
 
-_CRUD = {"c": "create", "r": "read", "u": "update", "d": "unlink"}
+_CRUD = {"c": "create", "r": "read", "u": "write", "d": "unlink"}
 
 
 class IrModelAccess(models.Model):
@@ -22,22 +22,42 @@ class IrModelAccess(models.Model):
         :param model: the name of the ORM model, e.g. sale.order
         :param crud: any combinatie of the letters crud
 
-        :return: the ids of the groups granting the requested accesses.
+        :return: frozenset with the ids of the groups granting
+                 the requested accesses.
+        """
+        for access in crud:
+            assert access in _CRUD, "Invalid crud parameter"
+        self.flush(
+            ["active", "group_id", "model_id"] + ["perm_" + x for x in _CRUD.values()]
+        )
+        return self._get_acl_access_group_ids_cached(model, crud)
+
+    @api.model
+    @tools.ormcache("model", "crud")
+    def _get_acl_access_group_ids_cached(self, model, crud):
+        """
+        The result is cached until the next call of the
+        ir.model.access cache clearing methods.
         """
         # pylint: disable=E8103
-        query = (
-            """
+        query = """
         SELECT rg.id
           FROM ir_model_access ima
           INNER JOIN ir_model im ON ima.model_id = im.id
           INNER JOIN res_groups rg ON ima.group_id = rg.id
-          WHERE im.model = '%s' AND ima.active = TRUE
+          WHERE im.model = %s AND ima.active = TRUE
         """
-            % model
-        )
         for access in crud:
-            assert access in _CRUD, "Invalid crud parameter"
             query += "AND ima.perm_%s = TRUE " % _CRUD[access]
-        self.env.cr.execute(query)
-        gids = self.env.cr.fetchall()
-        return [x[0] for x in gids]
+        self.env.cr.execute(query, (model,))
+        return frozenset(x[0] for x in self.env.cr.fetchall())
+
+    @api.model
+    @tools.ormcache("self.env.uid", "model", "crud")
+    def _user_has_acl_access(self, model, crud):
+        """
+        Return True if the groups of the current user grant ACL access
+        of type 'crud' to 'model', e.g. to hide smart buttons.
+        """
+        group_ids = self._get_acl_access_group_ids(model, crud)
+        return not group_ids.isdisjoint(self.env.user.groups_id.ids)
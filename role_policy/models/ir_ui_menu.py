@@ -2,6 +2,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+from collections import defaultdict
 
 from odoo import api, fields, models, tools
 from odoo.tools import config
@@ -22,7 +23,11 @@ class IrUiMenu(models.Model):
     )
 
     @api.model
-    @tools.ormcache("frozenset(self.env.user.groups_id.ids)", "debug")
+    @tools.ormcache(
+        "frozenset(self.env.user.groups_id.ids)",
+        "self.env.user._get_enabled_role_ids()",
+        "debug",
+    )
     def _visible_menu_ids(self, debug=False):
         """
         Hide all menus without the role_group(s) of the user.
@@ -32,38 +37,89 @@ class IrUiMenu(models.Model):
         else:
             visible_ids = super()._visible_menu_ids(debug=debug)
             user_roles = self.env.user.enabled_role_ids or self.env.user.role_ids
-            user_groups = user_roles.mapped("group_id")
-            for group in self._role_policy_untouchable_groups():
-                user_groups += self.env.ref(group)
-            menus = self.browse()
-            for menu in self.browse(visible_ids):
-                for group in menu.groups_id:
-                    if group in user_groups:
-                        menus |= menu
-                        continue
-
-            # remove menus without action menu
-            action_menus = menus.filtered(lambda m: m.action and m.action.exists())
-            # folder_menus = menus - action_menus
-            filtered_ids = []
-
-            def get_parent_ids(menu, menu_ids):
-                parent = menu.parent_id
-                if parent:
-                    if parent in menus:
-                        menu_ids.append(parent.id)
-                        return get_parent_ids(parent, menu_ids)
-                    else:
-                        return []
-                else:
-                    return menu_ids
-
-            for menu in action_menus:
-                filtered_ids += get_parent_ids(menu, [menu.id])
-
-            visible_ids = set(filtered_ids)
+            user_group_ids = set(user_roles.mapped("group_id").ids)
+            user_group_ids.update(self._get_role_policy_group_keep_ids())
+            visible_ids = self._role_policy_visible_menu_ids(
+                visible_ids, user_group_ids
+            )
+        return visible_ids
+
+    def _role_policy_visible_menu_ids(self, menu_ids, group_ids):
+        """
+        Filter the menus on the role groups of the user and
+        remove the menus without action menu.
+
+        The menu tree and group links are loaded in bulk and the
+        ancestors are resolved only once for all action menus.
+        """
+        if not menu_ids or not group_ids:
+            return set()
+        self.flush(["parent_id", "action", "groups_id"])
+        cr = self.env.cr
+        cr.execute(
+            """
+            SELECT DISTINCT menu_id
+              FROM ir_ui_menu_group_rel
+              WHERE menu_id IN %s AND gid IN %s
+            """,
+            (tuple(menu_ids), tuple(group_ids)),
+        )
+        menu_ids = [x[0] for x in cr.fetchall()]
+        if not menu_ids:
+            return set()
+        cr.execute(
+            "SELECT id, parent_id, action FROM ir_ui_menu WHERE id IN %s",
+            (tuple(menu_ids),),
+        )
+        parents = {}
+        menu_actions = {}
+        for menu_id, parent_id, action in cr.fetchall():
+            parents[menu_id] = parent_id
+            if action:
+                model, res_id = action.split(",")
+                menu_actions[menu_id] = (model, int(res_id))
+
+        visible_ids = set()
+        chain_ok = {}
+        for menu_id in self._get_existing_action_menu_ids(menu_actions):
+            path = []
+            current_id = menu_id
+            while current_id not in chain_ok:
+                path.append(current_id)
+                parent_id = parents[current_id]
+                if not parent_id:
+                    ok = True
+                    break
+                if parent_id not in parents:
+                    ok = False
+                    break
+                current_id = parent_id
+            else:
+                ok = chain_ok[current_id]
+            for path_id in path:
+                chain_ok[path_id] = ok
+            if ok:
+                visible_ids.update(path)
         return visible_ids
 
+    def _get_existing_action_menu_ids(self, menu_actions):
+        """
+        :param menu_actions: dict mapping menu ids to (action model, action id)
+        :return: the ids of the menus with an existing action,
+                 the actions are checked with one query per action model
+        """
+        action_ids = defaultdict(set)
+        for model, res_id in menu_actions.values():
+            action_ids[model].add(res_id)
+        existing = set()
+        for model, res_ids in action_ids.items():
+            if model not in self.env:
+                continue
+            existing.update(
+                (model, x) for x in self.env[model].browse(res_ids).exists().ids
+            )
+        return [k for k, v in menu_actions.items() if v in existing]
+
     @api.model
     @tools.ormcache("frozenset(self.env.user.groups_id.ids)", "debug")
     def _visible_menu_ids_user_admin(self, debug=False):
@@ -85,9 +141,12 @@ class IrUiMenu(models.Model):
         )
 
         # take apart menus that have an action
-        action_menus = menus.filtered(lambda m: m.action and m.action.exists())
-        folder_menus = menus - action_menus
-        visible = self.browse()
+        action_menu_ids = self._get_existing_action_menu_ids(
+            {m.id: (m.action._name, m.action.id) for m in menus if m.action}
+        )
+        action_menus = self.browse(action_menu_ids)
+        folder_menu_ids = set((menus - action_menus).ids)
+        visible_ids = set()
 
         # process action menus, check whether their action is allowed
         access = self.env["ir.model.access"]
@@ -104,10 +163,12 @@ class IrUiMenu(models.Model):
                 or access.check(get_model(menu.action), "read", False)
             ):
                 # make menu visible, and its folder ancestors, too
-                visible += menu
+                visible_ids.add(menu.id)
                 menu = menu.parent_id
-                while menu and menu in folder_menus and menu not in visible:
-                    visible += menu
+                while (
+                    menu and menu.id in folder_menu_ids and menu.id not in visible_ids
+                ):
+                    visible_ids.add(menu.id)
                     menu = menu.parent_id
 
-        return set(visible.ids)
+        return visible_ids
@@ -5,9 +5,9 @@ import logging
 
 from lxml import etree
 
-from odoo import _, api, models
+from odoo import _, api, models, tools
 from odoo.exceptions import UserError
-from odoo.tools import locate_node, safe_eval
+from odoo.tools import locate_node
 
 _logger = logging.getLogger(__name__)
 
@@ -27,17 +27,67 @@ class IrUiView(models.Model):
             del vals["groups_id"]
         return super().write(vals)
 
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
     def read_combined(self, fields=None):
-        res = super().read_combined(fields=fields)
         if self.env.user.exclude_from_role_policy:
-            return res
-        res["arch"] = self._remove_xml_comments(res["arch"])
-        res["arch"] = self._apply_view_type_attribute_rules(res["arch"])
-        archs = [(res["arch"], self.id)]
+            return super().read_combined(fields=fields)
+        if self.env.context.get("inherit_branding") or self.env.context.get(
+            "check_view_ids"
+        ):
+            return self._read_combined_role_policy(fields=fields)
+        res = self._read_combined_role_policy_cached(
+            fields and tuple(fields), self._role_policy_arch_cache_key()
+        )
+        return dict(res)
+
+    def _role_policy_arch_cache_key(self):
+        """
+        The role transformed arch depends on the view and its inheritance
+        chain (part of the cache since any view update clears the caches)
+        as well as on the following user and context dependent elements.
+        """
+        user = self.env.user
+        return (
+            user._get_enabled_role_ids(),
+            self.env.company.id,
+            frozenset(user.groups_id.ids),
+            self.env.is_admin(),
+            tuple(
+                (key, self.env.context.get(key))
+                for key in self._role_policy_arch_context_keys()
+            ),
+        )
+
+    def _role_policy_arch_context_keys(self):
+        """
+        Context keys used by read_combined, e.g. website_id is used by the
+        website module to select the inheriting views.
+        """
+        keys = set(self._read_template_keys())
+        keys.update(["lang", "edit_translations", "website_id"])
+        return sorted(keys)
+
+    @tools.ormcache("self.id", "fields", "cache_key")
+    def _read_combined_role_policy_cached(self, fields, cache_key):
+        return self._read_combined_role_policy(fields=fields and list(fields))
+
+    def _read_combined_role_policy(self, fields=None):
+        """
+        The role policy stages are applied on a single parse of the
+        combined view architecture.
+        """
+        res = super().read_combined(fields=fields)
+        parser = etree.XMLParser(remove_comments=True)
+        arch_node = etree.fromstring(res["arch"], parser=parser)
+        self._apply_view_type_attribute_rules(arch_node)
+        archs = [(arch_node, self.id)]
         archs = self._apply_view_modifier_remove_rules(self.model, archs)
         archs = self._apply_view_modifier_rules(self.model, archs)
         if archs:
-            arch_node = etree.fromstring(archs[0][0])
             self._remove_security_groups(arch_node)
             self._handle_roles(arch_node)
             arch = etree.tostring(arch_node, encoding="unicode")
@@ -49,21 +99,30 @@ class IrUiView(models.Model):
     @api.model
     def get_inheriting_views_arch(self, view_id, model):
         archs = super().get_inheriting_views_arch(view_id, model)
-        archs = self._apply_view_modifier_remove_rules(model, archs)
-        archs = self._apply_view_modifier_rules(model, archs)
-        return archs
-
-    def _remove_xml_comments(self, arch):
-        if "<!--" in arch:
-            s0, s1 = arch.split("<!--", 1)
-            s2 = s1.split("-->", 1)[1]
-            return s0 + s2
-        else:
-            return arch
+        rule_model = self.env["view.modifier.rule"]
+        views = self.browse([x[1] for x in archs])
+        remove_rules = rule_model._get_rules_by_view(model, views, remove=True)
+        modifier_rules = rule_model._get_rules_by_view(model, views)
+        res = []
+        for arch, arch_view_id in archs:
+            if not (remove_rules[arch_view_id] or modifier_rules[arch_view_id]):
+                res.append((arch, arch_view_id))
+                continue
+            arch_nodes = [(etree.fromstring(arch), arch_view_id)]
+            arch_nodes = self._apply_view_modifier_remove_rules(
+                model, arch_nodes, rules_by_view=remove_rules
+            )
+            arch_nodes = self._apply_view_modifier_rules(
+                model, arch_nodes, rules_by_view=modifier_rules
+            )
+            res.extend(
+                (etree.tostring(arch_node, encoding="unicode"), arch_view_id)
+                for arch_node, arch_view_id in arch_nodes
+            )
+        return res
 
-    def _apply_view_type_attribute_rules(self, arch):
+    def _apply_view_type_attribute_rules(self, arch_node):
         vta_rules = self.env["view.type.attribute"]._get_rules(self.id)
-        arch_node = etree.fromstring(arch)
         if vta_rules:
             [arch_node.set(r.attrib, r.attrib_val) for r in vta_rules]
 
@@ -80,16 +139,21 @@ class IrUiView(models.Model):
                             v.get("view_type_attribute") or k,
                             rule.disable and "false" or "true",
                         )
-        arch = etree.tostring(arch_node, encoding="unicode")
-        return arch
 
-    def _apply_view_modifier_remove_rules(self, model, archs_in):
-        archs = archs_in[:]
-        removal_indexes = []
-        for i, (arch, view_id) in enumerate(archs_in):
-            rules = self.env["view.modifier.rule"]._get_rules(
-                model, view_id, remove=True
+    def _apply_view_modifier_remove_rules(self, model, archs_in, rules_by_view=None):
+        """
+        :param archs_in: list of (arch_node, view_id) tuples
+        :param rules_by_view: optional dict with the removal rules per view id
+        :return: the archs_in list without the removed views
+        """
+        if rules_by_view is None:
+            rules_by_view = self.env["view.modifier.rule"]._get_rules_by_view(
+                model, self.browse([x[1] for x in archs_in]), remove=True
             )
+        archs = []
+        for arch_node, view_id in archs_in:
+            rules = rules_by_view[view_id]
+            remove_view = False
             for rule in rules:
                 if not rule.element:
                     if not rule.view_id:
@@ -101,52 +165,28 @@ class IrUiView(models.Model):
                             )
                             % (rule, rule.role_id.code)
                         )
-                    removal_indexes.append(i)
+                    remove_view = True
                 else:
-                    arch_node = etree.fromstring(arch)
-                    try:
-                        rule_node = etree.fromstring("<{}/>".format(rule.element))
-                    except Exception:
-                        raise UserError(
-                            _("Incorrect element definition in rule %s of role %s.")
-                            % (rule, rule.role_id.code)
-                        )
+                    rule_node = rule._get_element_node()
                     to_remove = locate_node(arch_node, rule_node)
                     if to_remove is not None:
                         to_remove.getparent().remove(to_remove)
-                        arch = etree.tostring(arch_node, encoding="unicode")
-                    archs[i] = (arch, view_id)
-        for i in sorted(removal_indexes, reverse=True):
-            del archs[i]
+            if not remove_view:
+                archs.append((arch_node, view_id))
         return archs
 
-    def _apply_view_modifier_rules(self, model, archs_in):
-        archs = []
-        for (arch, view_id) in archs_in:
-            view = self.browse(view_id)
-            rules = self.env["view.modifier.rule"]._get_rules(
-                model, view_id, view_type=view.type
+    def _apply_view_modifier_rules(self, model, archs, rules_by_view=None):
+        """
+        :param archs: list of (arch_node, view_id) tuples, updated in place
+        :param rules_by_view: optional dict with the modifier rules per view id
+        """
+        if rules_by_view is None:
+            rules_by_view = self.env["view.modifier.rule"]._get_rules_by_view(
+                model, self.browse([x[1] for x in archs])
             )
-            for rule in rules:
-                arch_node = etree.fromstring(arch)
-                el = rule.element
-                try:
-                    if el[:5] == "xpath":
-                        expr = safe_eval(el.split("expr=")[1])
-                    else:
-                        parts = el.split(" ")
-                        tag = parts[0].strip()
-                        attrib, val = parts[1].strip().split("=")
-                        attrib = attrib.strip()
-                        val = val.strip()[1:-1]
-                        expr = "//{}[@{}='{}']".format(tag, attrib, val)
-                except Exception:
-                    raise UserError(
-                        _("Incorrect element definition in rule %s of role %s.")
-                        % (rule, rule.role_id.code)
-                    )
-                expr = "({})[1]".format(expr)
-                rule_node = arch_node.xpath(expr)
+        for (arch_node, view_id) in archs:
+            for rule in rules_by_view[view_id]:
+                rule_node = rule._get_element_xpath()(arch_node)
                 if not rule_node:
                     continue
                 rule_node = rule_node[0]
@@ -173,8 +213,6 @@ class IrUiView(models.Model):
                 if attrs:
                     attrs = ", ".join(["'{}': {}".format(x[0], x[1]) for x in attrs])
                     rule_node.set("attrs", "{" + attrs + "}")
-                arch = etree.tostring(arch_node, encoding="unicode")
-            archs.append((arch, view_id))
         return archs
 
     @api.model
@@ -1,15 +1,38 @@
 # Copyright 2020-2021 Noviat
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import functools
 import logging
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
 from odoo.tools import config
 
 _logger = logging.getLogger(__name__)
 
 
+def method_execution_right(name):
+    """
+    Decorator to restrict the execution of a model method to the roles
+    with the Method Execution Right 'name', e.g. "account.move,post".
+
+    The method is executed with the 'role_policy_has_groups_ok' context.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self.env["model.method.execution.right"].check_right(
+                name, raise_exception=True
+            )
+            ctx = dict(self.env.context, role_policy_has_groups_ok=True)
+            return method(self.with_context(ctx), *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 class ModelMethodExecutionRight(models.Model):
     _name = "model.method.execution.right"
     _description = "Method Execution Right"
@@ -55,6 +78,22 @@ class ModelMethodExecutionRight(models.Model):
                 rec.model_id = False
                 rec.method = False
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        rights = super().create(vals_list)
+        self.clear_caches()
+        return rights
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
     @api.model
     def check_right(self, name, raise_exception=True):
         if (
@@ -63,15 +102,23 @@ class ModelMethodExecutionRight(models.Model):
             or config.get("test_enable")
         ):
             return True
-        user_roles = self.env.user.enabled_role_ids or self.env.user.role_ids
-        model_methods = user_roles.mapped("model_method_ids").filtered(
-            lambda r: r.name == "account.move,post"
-            and r.company_id == self.env.user.company_id
-            and r.active
+        allowed = name in self._get_allowed_names(
+            self.env.user._get_enabled_role_ids(), self.env.user.company_id.id
         )
-        if not model_methods and raise_exception:
+        if not allowed and raise_exception:
             raise UserError(
                 _("Your security role does not allow you to execute method %s") % name
             )
         else:
-            return model_methods and True or False
+            return allowed
+
+    @api.model
+    @tools.ormcache("role_ids", "company_id")
+    def _get_allowed_names(self, role_ids, company_id):
+        """
+        Return the Model Methods granted to a set of roles.
+        """
+        rights = self.sudo().search(
+            [("role_id", "in", list(role_ids)), ("company_id", "=", company_id)]
+        )
+        return frozenset(rights.mapped("name"))
@@ -1,7 +1,7 @@
 # Copyright 2020 Noviat
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models, tools
 
 
 class ResGroups(models.Model):
@@ -14,3 +14,52 @@ class ResGroups(models.Model):
     add def create/write to disable adding menu, action, view access
     via the groups m2m relations.
     """
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "role" in vals:
+            self.clear_caches()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_role_policy_groups_table(self):
+        """
+        Return a dict mapping the group external identifiers
+        to a tuple (is_untouchable, is_role).
+        """
+        untouchable_groups = self._role_policy_untouchable_groups()
+        self.flush(["role"])
+        self.env.cr.execute(
+            """
+            SELECT imd.module, imd.name, rg.role
+              FROM ir_model_data imd
+              INNER JOIN res_groups rg ON imd.res_id = rg.id
+              WHERE imd.model = 'res.groups'
+            """
+        )
+        table = {}
+        for module, name, role in self.env.cr.fetchall():
+            xml_id = "{}.{}".format(module, name)
+            table[xml_id] = (xml_id in untouchable_groups, bool(role))
+        return table
+
+    @api.model
+    @tools.ormcache("groups")
+    def _role_policy_filter_groups(self, groups):
+        """
+        Return the 'groups' string without the no-role groups.
+        """
+        table = self._get_role_policy_groups_table()
+        untouchable_groups = self._role_policy_untouchable_groups()
+        role_groups = []
+        for group_ext_id in groups.split(","):
+            xml_id = group_ext_id[0] == "!" and group_ext_id[1:] or group_ext_id
+            if xml_id in table:
+                is_untouchable, is_role = table[xml_id]
+            else:
+                is_untouchable = xml_id in untouchable_groups
+                is_role = not is_untouchable and self.env.ref(xml_id).role
+            if is_untouchable or is_role:
+                role_groups.append(group_ext_id)
+        return ",".join(role_groups)
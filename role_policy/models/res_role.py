@@ -1,7 +1,7 @@
 # Copyright 2020 Noviat
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
 
 
@@ -144,12 +144,13 @@ class ResRole(models.Model):
 
     def write(self, vals):
         self = self.with_context(dict(self.env.context, role_policy_init=True))
+        old_user_ids = {}
         for role in self:
             if vals.get("code"):
                 if role.code != vals["code"] and role.acl_ids:
                     raise UserError(_("You are not allowed to update the code."))
             if "user_ids" in vals:
-                self._update_role_groups(role, vals)
+                old_user_ids[role] = set(role.user_ids.ids)
             updates = []
             role_gid = role.group_id.id
             for f in ["menu_ids", "act_window_ids", "act_server_ids", "act_report_ids"]:
@@ -173,34 +174,66 @@ class ResRole(models.Model):
                         else:
                             raise NotImplementedError
         res = super().write(vals)
+        for role, user_ids in old_user_ids.items():
+            self._update_role_groups(role, user_ids)
         for model, model_ids, command in updates:
             rs = self.env[model].browse(model_ids)
             rs.write({"groups_id": command})
+        self.clear_caches()
         return res
 
-    def _update_role_groups(self, role, vals):
-        role.group_id.write({"users": vals["user_ids"]})
-        # remove user from role_acl groups
-        for entry in vals["user_ids"]:
-            if entry[0] == 6:
-                removals = role.user_ids.filtered(lambda r: r.id not in entry[2])
-                for user in removals:
-                    extra_roles = user.role_ids - role
-                    extra_roles_acl_groups = extra_roles.mapped("group_id.implied_ids")
-                    for role_acl_group in role.group_id.implied_ids:
-                        if role_acl_group in extra_roles_acl_groups:
-                            continue
-                        role_acl_group.users -= user
-            else:
-                # TODO
-                raise NotImplementedError
+    def _update_role_groups(self, role, old_user_ids):
+        """
+        Synchronise the role group users with the role users.
+
+        The users removed from the role are also removed from the
+        role_acl groups which are not granted by any of their other roles.
+        """
+        new_user_ids = set(role.user_ids.ids)
+        added_ids = new_user_ids - old_user_ids
+        removed_ids = old_user_ids - new_user_ids
+        group_updates = [(4, x) for x in added_ids] + [(3, x) for x in removed_ids]
+        if group_updates:
+            role.group_id.write({"users": group_updates})
+        if not removed_ids:
+            return
+
+        self.env["res.role.acl"]._remove_acl_group_users(
+            list(removed_ids), role.group_id.implied_ids.ids
+        )
 
     def unlink(self):
         role_groups = self.mapped("group_id")
         res = super().unlink()
         role_groups.unlink()
+        self.clear_caches()
         return res
 
+    @api.model
+    def _get_policy_snapshot(self):
+        """
+        Return the compiled role policy of the current user.
+        """
+        return self._compile_policy_snapshot(
+            self.env.user._get_enabled_role_ids(), self.env.company.id
+        )
+
+    @api.model
+    @tools.ormcache("role_ids", "company_id")
+    def _compile_policy_snapshot(self, role_ids, company_id):
+        """
+        The rules of a set of roles are retrieved once and indexed
+        per rule model. The snapshot is shared by all users with the same
+        set of roles and cleared when the rules or roles are changed.
+        """
+        return {
+            model: self.env[model]._compile_rules(role_ids)
+            for model in self._policy_snapshot_models()
+        }
+
+    def _policy_snapshot_models(self):
+        return ["view.modifier.rule", "view.model.operation", "view.type.attribute"]
+
     def export_xls(self):
         report_file = "role_policy_{}_{}".format(
             self.code, fields.Date.to_string(fields.Date.today())
@@ -226,7 +259,9 @@ class ResRole(models.Model):
             "view_mode": "form",
             "res_model": "role.policy.import",
             "view_id": view.id,
-            "context": dict(self.env.context, active_id=self.id),
+            "context": dict(
+                self.env.context, active_model=self._name, active_id=self.id
+            ),
             "target": "new",
             "type": "ir.actions.act_window",
         }
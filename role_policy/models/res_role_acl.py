@@ -44,11 +44,10 @@ class ResRoleAcl(models.Model):
         comodel_name="res.company", related="role_id.company_id", store=True
     )
 
-    @api.model
-    def create(self, vals):
-        if vals.get("active", True):
-            self._create_role_acl(vals)
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._create_role_acl([x for x in vals_list if x.get("active", True)])
+        return super().create(vals_list)
 
     def unlink(self):
         self._unlink_role_acl()
@@ -58,24 +57,57 @@ class ResRoleAcl(models.Model):
         self._update_role_acl(vals)
         return super().write(vals)
 
-    def _create_role_acl(self, vals):
-        role = self.env["res.role"].browse(vals["role_id"])
-        model = self.env["ir.model"].browse(vals["model_id"])
-        crud = self._compute_crud(vals)
-        acl_group = self._compute_group(model, crud, role)
-        role.group_id.implied_ids += acl_group
-        name = "_".join([role.code, acl_group.name])
-        access = self._compute_access(model, crud, acl_group)
-        vals.update({"name": name, "group_id": acl_group.id, "access_id": access.id})
+    def _create_role_acl(self, vals_list):
+        """
+        The role_acl groups and accesses of all vals are retrieved
+        and created in batch.
+        """
+        if not vals_list:
+            return
+        roles = {
+            x.id: x
+            for x in self.env["res.role"].browse({v["role_id"] for v in vals_list})
+        }
+        models_by_id = {
+            x.id: x
+            for x in self.env["ir.model"].browse({v["model_id"] for v in vals_list})
+        }
+        acl_entries = {}
+        entries = []
+        for vals in vals_list:
+            role = roles[vals["role_id"]]
+            model = models_by_id[vals["model_id"]]
+            crud = self._compute_crud(vals)
+            group_name = self._compute_group_name(model, crud, role)
+            acl_entries[group_name] = (model, crud)
+            entries.append((vals, role, group_name))
+
+        groups = self._compute_groups(list(acl_entries))
+        accesses = self._compute_accesses(
+            {
+                name: (model, crud, groups[name])
+                for name, (model, crud) in acl_entries.items()
+            }
+        )
+        role_gids = {}
+        for vals, role, group_name in entries:
+            acl_group = groups[group_name]
+            role_gids.setdefault(role, []).append(acl_group.id)
+            vals.update(
+                {
+                    "name": "_".join([role.code, group_name]),
+                    "group_id": acl_group.id,
+                    "access_id": accesses[group_name].id,
+                }
+            )
+        for role, gids in role_gids.items():
+            role.group_id.write({"implied_ids": [(4, x) for x in gids]})
 
     def _unlink_role_acl(self):
         for acl in self:
             acl.role_id.group_id.implied_ids -= acl.group_id
-            for user in acl.group_id.users:
-                extra_roles = user.role_ids - acl.role_id
-                if acl.group_id in extra_roles.mapped("group_id.implied_ids"):
-                    continue
-                acl.group_id.users -= user
+        acl_groups = self.mapped("group_id")
+        self._remove_acl_group_users(acl_groups.mapped("users").ids, acl_groups.ids)
 
     def _update_role_acl(self, vals):
         for acl in self:
@@ -92,7 +124,9 @@ class ResRoleAcl(models.Model):
                     (3, old_acl_group.id),
                     (4, acl_group.id),
                 ]
-                acl.role_id.user_ids.update({"groups_id": [(3, old_acl_group.id)]})
+                self._remove_acl_group_users(
+                    acl.role_id.user_ids.ids, [old_acl_group.id]
+                )
                 access = self._compute_access(model, crud, acl_group)
                 vals.update(
                     {
@@ -104,10 +138,71 @@ class ResRoleAcl(models.Model):
             if "active" in vals and vals["active"] != acl.active:
                 if not vals["active"]:
                     acl.role_id.group_id.implied_ids = [(3, acl_group.id)]
-                    acl.role_id.user_ids.update({"groups_id": [(3, acl_group.id)]})
+                    self._remove_acl_group_users(
+                        acl.role_id.user_ids.ids, [acl_group.id]
+                    )
                 else:
                     acl.role_id.group_id.implied_ids = [(4, acl_group.id)]
-                    acl.role_id.user_ids.update({"groups_id": [(4, acl_group.id)]})
+                    acl_group.write(
+                        {"users": [(4, x) for x in acl.role_id.user_ids.ids]}
+                    )
+
+    @api.model
+    def _get_acl_group_user_counts(self, user_ids, group_ids):
+        """
+        Returns the number of enforced roles granting a role_acl group to a user
+        as a {(uid, gid): count} dict.
+        The enforced roles are the enabled roles of the user or all his roles
+        when no roles are enabled.
+        """
+        if not user_ids or not group_ids:
+            return {}
+        self.env["res.role"].flush(["active", "group_id", "user_ids"])
+        self.env["res.users"].flush(["role_ids", "enabled_role_ids"])
+        self.env["res.groups"].flush(["implied_ids"])
+        cr = self.env.cr
+        cr.execute(
+            """
+            WITH enabled AS (
+              SELECT e.uid, e.role_id
+                FROM res_role_users_enabled_rel e
+                JOIN res_role_users_rel ru
+                  ON ru.uid = e.uid AND ru.role_id = e.role_id
+                JOIN res_role r ON r.id = e.role_id
+                WHERE r.active AND e.uid IN %s
+            )
+            SELECT ur.uid, gi.hid, COUNT(*)
+              FROM (
+                SELECT uid, role_id FROM enabled
+                UNION ALL
+                SELECT ru.uid, ru.role_id
+                  FROM res_role_users_rel ru
+                  WHERE ru.uid NOT IN (SELECT uid FROM enabled)
+              ) ur
+              JOIN res_role r ON r.id = ur.role_id
+              JOIN res_groups_implied_rel gi ON gi.gid = r.group_id
+              WHERE r.active AND ur.uid IN %s AND gi.hid IN %s
+              GROUP BY ur.uid, gi.hid
+            """,
+            (tuple(user_ids), tuple(user_ids), tuple(group_ids)),
+        )
+        return {(uid, gid): count for uid, gid, count in cr.fetchall()}
+
+    @api.model
+    def _remove_acl_group_users(self, user_ids, group_ids):
+        """
+        Remove the users from the role_acl groups which are not granted
+        by any of their roles.
+        Users with the same removals are updated together.
+        """
+        counts = self._get_acl_group_user_counts(user_ids, group_ids)
+        group_removals = {}
+        for gid in group_ids:
+            uids = frozenset(x for x in user_ids if not counts.get((x, gid)))
+            if uids:
+                group_removals.setdefault(uids, []).append(gid)
+        for uids, gids in group_removals.items():
+            self.env["res.groups"].browse(gids).write({"users": [(3, x) for x in uids]})
 
     def _compute_crud(self, vals):
         if "perm_create" in vals:
@@ -128,24 +223,58 @@ class ResRoleAcl(models.Model):
             crud += self.perm_unlink and "d" or ""
         return crud
 
-    def _compute_group(self, model, crud, role):
+    def _compute_group_name(self, model, crud, role):
         group_name = "_".join(["role_acl", model.model.replace(".", "_"), crud])
         if role.company_id:
             group_name += "_{}".format(role.company_id.id)
-        group = self.env["res.groups"].search([("name", "=", group_name)])
-        if not group:
+        return group_name
+
+    def _compute_group(self, model, crud, role):
+        group_name = self._compute_group_name(model, crud, role)
+        return self._compute_groups([group_name])[group_name]
+
+    def _compute_groups(self, group_names):
+        """
+        Returns the role_acl groups by name, missing groups are created.
+        """
+        groups = {}
+        for group in self.env["res.groups"].search([("name", "in", group_names)]):
+            groups.setdefault(group.name, group)
+        missing = [x for x in group_names if x not in groups]
+        if missing:
             categ = self.env.ref("role_policy.ir_module_category_role")
-            group = self.env["res.groups"].create(
-                {"role": True, "name": group_name, "category_id": categ.id}
+            new_groups = self.env["res.groups"].create(
+                [{"role": True, "name": x, "category_id": categ.id} for x in missing]
             )
-        return group
+            groups.update(zip(missing, new_groups))
+        return groups
 
     def _compute_access(self, model, crud, acl_group):
-        access = self.env["ir.model.access"].search([("name", "=", acl_group.name)])
-        if not access:
-            access_vals = {CRUD2FLD[k]: True for k in crud}
-            access_vals.update(
-                {"name": acl_group.name, "model_id": model.id, "group_id": acl_group.id}
-            )
-            access = self.env["ir.model.access"].create(access_vals)
-        return access
+        return self._compute_accesses({acl_group.name: (model, crud, acl_group)})[
+            acl_group.name
+        ]
+
+    def _compute_accesses(self, acl_entries):
+        """
+        Returns the role_acl accesses by name, missing accesses are created.
+
+        :param acl_entries: dict of access name: (model, crud, acl_group)
+        """
+        accesses = {}
+        for access in self.env["ir.model.access"].search(
+            [("name", "in", list(acl_entries))]
+        ):
+            accesses.setdefault(access.name, access)
+        missing = [x for x in acl_entries if x not in accesses]
+        if missing:
+            vals_list = []
+            for name in missing:
+                model, crud, acl_group = acl_entries[name]
+                access_vals = {CRUD2FLD[k]: True for k in crud}
+                access_vals.update(
+                    {"name": name, "model_id": model.id, "group_id": acl_group.id}
+                )
+                vals_list.append(access_vals)
+            new_accesses = self.env["ir.model.access"].create(vals_list)
+            accesses.update(zip(missing, new_accesses))
+        return accesses
@@ -10,7 +10,11 @@ from odoo.tools import config
 
 from odoo.addons.base.models.res_users import Users as ResUsersBase
 
-from .helpers import diff_to_odoo_x2many_commands, play_odoo_x2x_commands_on_ids
+from .helpers import (
+    diff_to_odoo_x2many_commands,
+    play_odoo_x2x_commands_on_ids,
+    play_odoo_x2x_create_commands,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -76,33 +80,45 @@ class ResUsers(models.Model):
     def create(self, vals_list):
         """
         Remove no role groups.
+
+        The role groups are resolved once for all the vals in vals_list.
         """
         if config.get("test_enable"):
             return super().create(vals_list)
 
         keep_ids = self._get_role_policy_group_keep_ids()
+        vals_list = [self._remove_reified_groups(vals) for vals in vals_list]
+        vals_rids = []
+        new_role_indexes = []
         for i, vals in enumerate(vals_list):
-            vals = self._remove_reified_groups(vals)
-            gids = []
-            role_gids = []
+            rids, has_new = play_odoo_x2x_create_commands(vals.get("role_ids"))
+            vals_rids.append(rids)
+            if has_new:
+                new_role_indexes.append(i)
+
+        roles = self.env["res.role"].browse(set().union(*vals_rids))
+        role_gids = {role.id: role.group_id.id for role in roles.exists()}
+
+        for vals, rids in zip(vals_list, vals_rids):
+            gids = set()
             if "groups_id" in vals:
-                for entry in vals["groups_id"]:
-                    if entry[0] == 4 and entry[1] in keep_ids:
-                        gids.append(entry[1])
-                    if entry[0] == 6:
-                        gids.extend([x for x in entry[2] if x in keep_ids])
+                gids, dummy = play_odoo_x2x_create_commands(vals["groups_id"])
+                gids &= keep_ids
                 if gids:
-                    vals["groups_id"] = [(6, 0, gids)]
+                    vals["groups_id"] = [(6, 0, list(gids))]
             if "role_ids" in vals:
-                for entry in vals["role_ids"]:
-                    if entry[0] == 6:
-                        roles = self.env["res.role"].browse(entry[2])
-                        role_gids += [x.id for x in roles.mapped("group_id")]
-                    else:
-                        raise NotImplementedError
-                vals["groups_id"] = [(6, 0, role_gids + gids)]
-            vals_list[i] = vals
+                gids |= {role_gids[x] for x in rids if x in role_gids}
+                vals["groups_id"] = [(6, 0, list(gids))]
         users = super().create(vals_list)
+
+        # add the groups of the roles created via the role_ids commands
+        for i in new_role_indexes:
+            user = users[i]
+            role_groups = user.role_ids.mapped("group_id") - user.groups_id
+            if role_groups:
+                super(ResUsers, user).write(
+                    {"groups_id": [(4, x) for x in role_groups.ids]}
+                )
         users._role_policy_remove_no_role_groups()
         return users
 
@@ -126,8 +142,7 @@ class ResUsers(models.Model):
         if not self:
             return True
 
-        for user in self:
-            user._role_policy_write(vals)
+        self._role_policy_write(vals)
         self._role_policy_remove_no_role_groups()
 
         return True
@@ -143,6 +158,14 @@ class ResUsers(models.Model):
         else:
             return True
 
+    def _get_enabled_role_ids(self):
+        """
+        Return the ids of the roles enforced for the user,
+        i.e. the enabled roles or all roles when no roles are enabled.
+        """
+        roles = self.enabled_role_ids or self.role_ids
+        return frozenset(roles.ids)
+
     def has_role(self, code):
         roles = self.env.user.enabled_role_ids or self.env.user.role_ids
         return code in roles.mapped("code")
@@ -179,69 +202,125 @@ class ResUsers(models.Model):
         return res
 
     def _role_policy_remove_no_role_groups(self):
+        """
+        Remove the groups which are neither role groups nor keep groups.
+
+        The group memberships of all users are pruned with a single query,
+        hence we need to invalidate the ORM cache of the relation afterwards.
+        """
+        users = self.filtered(lambda r: not r.exclude_from_role_policy)
+        if not users:
+            return
         keep_ids = self._get_role_policy_group_keep_ids()
-        ctx = dict(self.env.context, role_policy_bypass_write=True)
-        for user in self.with_context(ctx):
-            if user.exclude_from_role_policy:
-                continue
-            groups = user.groups_id
-            to_remove = groups.filtered(lambda r: r.id not in keep_ids and not r.role)
-            if to_remove:
-                super(ResUsersBase, user).write(
-                    {"groups_id": [(3, x) for x in to_remove.ids]}
-                )
+        self.flush(["groups_id"])
+        self.env["res.groups"].flush(["role", "users"])
+        cr = self.env.cr
+        cr.execute(
+            """
+            DELETE FROM res_groups_users_rel rel
+              USING res_groups g
+              WHERE g.id = rel.gid
+                AND rel.uid IN %s
+                AND g.role IS NOT TRUE
+                AND rel.gid NOT IN %s
+              RETURNING rel.uid
+            """,
+            (tuple(users.ids), tuple(keep_ids) or (0,)),
+        )
+        uids = {x[0] for x in cr.fetchall()}
+        if not uids:
+            return
+        users = self.browse(uids)
+        users.invalidate_cache(["groups_id"], list(uids))
+        self.env["res.groups"].invalidate_cache(["users"])
+        users.modified(["groups_id"])
+        users._role_policy_clear_caches()
 
     def _role_policy_write(self, vals):
         """
         remove no role groups
         remove role ACL groups when removing/disabling roles
+
+        The updates are computed for all users at once and the users
+        with identical updates are written together.
         """
-        self.ensure_one()
-        group_updates = vals.get("groups_id")
-        vals.pop("groups_id", None)
-        role_updates = vals.get("role_ids", [])
-        enabled_role_updates = vals.get("enabled_role_ids", [])
+        vals = dict(vals)
+        group_updates = vals.pop("groups_id", None)
+        role_updates = vals.pop("role_ids", None)
+        enabled_role_updates = vals.pop("enabled_role_ids", None)
         keep_gids = self._get_role_policy_group_keep_ids()
 
-        # remove no role groups
-        target_gids = set(self.groups_id.ids)
-        if group_updates:
-            target_gids = play_odoo_x2x_commands_on_ids(target_gids, group_updates)
-        target_gids = {x for x in target_gids if x in keep_gids}
-
-        # remove enabled roles that are no longer in roles
-        current_rids = new_rids = set(self.role_ids.ids)
-        current_enabled_rids = new_enabled_rids = set(self.enabled_role_ids.ids)
-        if role_updates:
-            new_rids = play_odoo_x2x_commands_on_ids(current_rids, role_updates)
-        if enabled_role_updates:
-            new_enabled_rids = play_odoo_x2x_commands_on_ids(
-                current_enabled_rids, enabled_role_updates
+        role_gids = {}
+        batches = {}
+        for user in self:
+            # remove no role groups
+            current_gids = set(user.groups_id.ids)
+            target_gids = current_gids
+            if group_updates:
+                target_gids = play_odoo_x2x_commands_on_ids(target_gids, group_updates)
+            target_gids = {x for x in target_gids if x in keep_gids}
+
+            # remove enabled roles that are no longer in roles
+            current_rids = new_rids = set(user.role_ids.ids)
+            current_enabled_rids = new_enabled_rids = set(user.enabled_role_ids.ids)
+            if role_updates:
+                new_rids = play_odoo_x2x_commands_on_ids(current_rids, role_updates)
+            if enabled_role_updates:
+                new_enabled_rids = play_odoo_x2x_commands_on_ids(
+                    current_enabled_rids, enabled_role_updates
+                )
+            new_enabled_rids &= new_rids
+
+            # remove role ACL groups when removing/disabling roles
+            target_rids = frozenset(new_enabled_rids or new_rids)
+            if target_rids:
+                if target_rids not in role_gids:
+                    enabled_roles = self.env["res.role"].browse(target_rids)
+                    enabled_role_groups = enabled_roles.mapped("group_id")
+                    enabled_role_groups |= enabled_role_groups.mapped("implied_ids")
+                    role_gids[target_rids] = set(enabled_role_groups.ids)
+                target_gids |= role_gids[target_rids]
+
+            user_updates = tuple(
+                tuple(sorted(diff_to_odoo_x2many_commands(current_ids, target_ids)))
+                for current_ids, target_ids in [
+                    (current_rids, new_rids),
+                    (current_enabled_rids, new_enabled_rids),
+                    (current_gids, target_gids),
+                ]
             )
-        new_enabled_rids &= new_rids
-
-        # remove role ACL groups when removing/disabling roles
-        target_rids = new_enabled_rids or new_rids
-        if target_rids:
-            enabled_roles = self.env["res.role"].browse(target_rids)
-            enabled_role_groups = enabled_roles.mapped("group_id")
-            enabled_role_groups |= enabled_role_groups.mapped("implied_ids")
-            target_gids |= set(enabled_role_groups.ids)
-        group_updates = diff_to_odoo_x2many_commands(self.groups_id.ids, target_gids)
-
-        vals["role_ids"] = diff_to_odoo_x2many_commands(self.role_ids.ids, new_rids)
-        vals["enabled_role_ids"] = diff_to_odoo_x2many_commands(
-            self.enabled_role_ids.ids, new_enabled_rids
-        )
-        # empty 'commands' on x2M fields (e.g. vals["role_ids"] = []) should not
-        # have any effect but the ORM seems to handle these as a regular write
-        # hence we hit an ACL error on fields that do not belong to the
-        # SELF_WRITEABLE_FIELDS.
-        for fld in ("role_ids", "enabled_role_ids"):
-            if vals.get(fld) == []:
-                del vals[fld]
-        super().write(vals)
-
-        if group_updates:
-            super(ResUsersBase, self.sudo()).write({"groups_id": group_updates})
-            self.clear_caches()
+            batches.setdefault(user_updates, []).append(user.id)
+
+        groups_updated = False
+        for (role_cmds, enabled_role_cmds, group_cmds), user_ids in batches.items():
+            users = self.browse(user_ids)
+            user_vals = dict(vals)
+            # empty 'commands' on x2M fields (e.g. vals["role_ids"] = []) should not
+            # have any effect but the ORM seems to handle these as a regular write
+            # hence we hit an ACL error on fields that do not belong to the
+            # SELF_WRITEABLE_FIELDS.
+            if role_cmds:
+                user_vals["role_ids"] = list(role_cmds)
+            if enabled_role_cmds:
+                user_vals["enabled_role_ids"] = list(enabled_role_cmds)
+            super(ResUsers, users).write(user_vals)
+
+            if group_cmds:
+                super(ResUsersBase, users.sudo()).write({"groups_id": list(group_cmds)})
+                groups_updated = True
+
+        if groups_updated:
+            self._role_policy_clear_caches()
+
+    def _role_policy_clear_caches(self):
+        """
+        Clear the caches which depend on the group memberships of the users.
+        The group updates bypass the standard res.users write hence we clear
+        the same caches as this method.
+        These caches share the registry cache, hence a role switch which
+        changes the groups of the user clears the cache of all users.
+        A role switch without group changes does not clear any cache.
+        """
+        self.env["ir.model.access"].call_cache_clearing_methods()
+        self.env["ir.rule"].clear_caches()
+        self.has_group.clear_cache(self)
@@ -32,8 +32,9 @@ class RolePolicyMenuActionCommon(models.AbstractModel):
     def write(self, vals):
         if not self.env.context.get("role_policy_init") and "groups_id" in vals:
             # keep untouchable groups as well as role groups
-            keep_ids = self._get_role_policy_group_keep_ids()
-            keep_ids += self.groups_id.filtered(lambda r: r.role).ids
+            keep_ids = self._get_role_policy_group_keep_ids().union(
+                self.groups_id.filtered(lambda r: r.role).ids
+            )
             commands = filter_odoo_x2many_commands(vals.get("groups_id", []), keep_ids)
             if commands:
                 vals["groups_id"] = commands
@@ -7,6 +7,8 @@ from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 from odoo.tools import config
 
+from .helpers import select_rules_by_priority
+
 _logger = logging.getLogger(__name__)
 
 
@@ -42,6 +44,22 @@ class ViewModelOperation(models.Model):
         comodel_name="res.company", related="role_id.company_id", store=True
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.clear_caches()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
     @api.model
     def _selection_operation(self):
         ops_dict = self._operations_dict()
@@ -91,39 +109,56 @@ class ViewModelOperation(models.Model):
             "archive": {"label": _("Archive")},
         }
 
+    def _compile_rules(self, role_ids):
+        """
+        Index the rules of a set of roles for the role policy snapshot.
+        """
+        rules = self.with_context(active_test=True).search(
+            [("role_id", "in", list(role_ids))]
+        )
+        return {
+            "ids": tuple(rules.ids),
+            "roles_nbr": len(role_ids),
+            "rules": [
+                {
+                    "id": rule.id,
+                    "priority": rule.priority,
+                    "model": rule.model,
+                    "operation": rule.operation,
+                }
+                for rule in rules
+            ],
+            "resolved": {},
+        }
+
     def _get_rules(self, model=None):
         rules = self.browse()
         if self.env.user.exclude_from_role_policy or config.get("test_enable"):
             return rules
-        signature_fields = self._rule_signature_fields()
-        user_roles = self.env.user.enabled_role_ids or self.env.user.role_ids
-        dom = [("role_id", "in", user_roles.ids)]
-        if model:
-            dom.append(("model", "in", (model, "default")))
-        all_rules = self.search(dom)
-        rules_dict = {}
-        for rule in all_rules:
-            key = "-".join([str(getattr(rule, f)) for f in signature_fields])
-            if key not in rules_dict:
-                rules_dict[key] = rule
-            else:
-                rules_dict[key] += rule
-        # Keep only rules with highest priority.
-        # No rule for one of the user roles is considered highest priority
-        roles_nbr = len(user_roles)
-        for key in rules_dict:
-            key_rules = rules_dict[key]
-            if len(key_rules) != roles_nbr:
-                continue
-            rules += key_rules.sorted(lambda r: r.priority)[0]
-        if model:
-            default_rules = rules.filtered(lambda r: r.model == "default")
-            model_rules = rules - default_rules
-            model_rules_operations = [r.operation for r in model_rules]
-            rules -= default_rules.filtered(
-                lambda r: r.operation in model_rules_operations
+        snapshot = self.env["res.role"]._get_policy_snapshot()[self._name]
+        rule_ids = snapshot["resolved"].get(model)
+        if rule_ids is None:
+            candidates = snapshot["rules"]
+            if model:
+                candidates = [r for r in candidates if r["model"] in (model, "default")]
+            selected = select_rules_by_priority(
+                candidates, self._rule_signature_fields(), snapshot["roles_nbr"]
             )
-        return rules
+            if model:
+                rules_dict = {r["id"]: r for r in candidates}
+                model_rules_operations = {
+                    rules_dict[x]["operation"]
+                    for x in selected
+                    if rules_dict[x]["model"] != "default"
+                }
+                selected = [
+                    x
+                    for x in selected
+                    if rules_dict[x]["model"] != "default"
+                    or rules_dict[x]["operation"] not in model_rules_operations
+                ]
+            rule_ids = snapshot["resolved"][model] = tuple(selected)
+        return rules.browse(rule_ids).with_prefetch(snapshot["ids"])
 
     def _rule_signature_fields(self):
         return ["model", "operation"]
@@ -3,12 +3,20 @@
 
 import logging
 
+from lxml import etree
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 from odoo.tools import config, safe_eval
+from odoo.tools.lru import LRU
+
+from .helpers import select_rules_by_priority
 
 _logger = logging.getLogger(__name__)
 
+# process-level cache of the parsed rule elements
+_ELEMENT_CACHE = LRU(8192)
+
 
 class ViewModifierRule(models.Model):
     _name = "view.modifier.rule"
@@ -85,6 +93,22 @@ class ViewModifierRule(models.Model):
         comodel_name="res.company", related="role_id.company_id", store=True
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.clear_caches()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
     def _selection_view_type(self):
         return [
             ("tree", "Tree"),
@@ -159,9 +183,14 @@ class ViewModifierRule(models.Model):
     def _resolve_rule_element_button_name(self, name, line_errors):
         if name[:2] == "%(" and name[-2:] == ")d":
             xml_id = name[2:-2]
-            act_id = self.env["ir.model.data"].xmlid_to_res_model_res_id(
-                xml_id, raise_if_not_found=False
-            )
+            # External Identifiers resolved in batch by the policy import
+            xml_ids = self.env.context.get("role_policy_import_xml_ids") or {}
+            if xml_id in xml_ids:
+                act_id = xml_ids[xml_id]
+            else:
+                act_id = self.env["ir.model.data"].xmlid_to_res_model_res_id(
+                    xml_id, raise_if_not_found=False
+                )
             if act_id[0] not in [
                 "ir.actions.act_window",
                 "ir.actions.server",
@@ -190,6 +219,67 @@ class ViewModifierRule(models.Model):
             err += _('e.g. name="%(sale.act_res_partner_2_sale_order)d"')
             line_errors.append(err)
 
+    def _check_element_syntax(self, line_errors):
+        try:
+            if self.remove:
+                self._get_element_node()
+            else:
+                self._get_element_xpath()
+        except UserError:
+            line_errors.append(
+                _("Incorrect value '%s' for field 'Element'.") % self.element_ui
+            )
+
+    def _get_element_xpath(self):
+        """
+        Return the compiled XPath which locates the first view element
+        matching the rule element.
+        """
+        key = ("xpath", self.element)
+        xpath = _ELEMENT_CACHE.get(key)
+        if xpath is None:
+            try:
+                expr = self._get_element_xpath_expr()
+                xpath = etree.XPath("({})[1]".format(expr))
+            except Exception:
+                raise UserError(self._element_error_message())
+            _ELEMENT_CACHE[key] = xpath
+        return xpath
+
+    def _get_element_xpath_expr(self):
+        el = self.element
+        if el[:5] == "xpath":
+            expr = safe_eval(el.split("expr=")[1])
+        else:
+            parts = el.split(" ")
+            tag = parts[0].strip()
+            attrib, val = parts[1].strip().split("=")
+            attrib = attrib.strip()
+            val = val.strip()[1:-1]
+            expr = "//{}[@{}='{}']".format(tag, attrib, val)
+        return expr
+
+    def _get_element_node(self):
+        """
+        Return the rule element as a view inheritance spec node
+        for the removal rules.
+        """
+        key = ("node", self.element)
+        node = _ELEMENT_CACHE.get(key)
+        if node is None:
+            try:
+                node = etree.fromstring("<{}/>".format(self.element))
+            except Exception:
+                raise UserError(self._element_error_message())
+            _ELEMENT_CACHE[key] = node
+        return node
+
+    def _element_error_message(self):
+        return _("Incorrect element definition in rule %s of role %s.") % (
+            self,
+            self.role_id.code,
+        )
+
     @api.constrains("view_id", "view_type")
     def _check_view(self):
         for rule in self:
@@ -212,6 +302,20 @@ class ViewModifierRule(models.Model):
                         % rule.id
                     )
 
+    @api.constrains("element", "remove")
+    def _check_element(self):
+        errors = ""
+        for rule in self:
+            if not rule.element:
+                continue
+            rule_errors = []
+            rule._check_element_syntax(rule_errors)
+            if rule_errors:
+                rule_errors.insert(0, _("Error while processing rule %s") % rule)
+                errors += "\n".join(rule_errors) + "\n"
+        if errors:
+            raise UserError(errors)
+
     @api.constrains("modifier_invisible", "modifier_readonly", "modifier_required")
     def _check_modifier(self):
         """TODO: add checks on modifier syntax"""
@@ -227,39 +331,73 @@ class ViewModifierRule(models.Model):
         if self.view_type == "qweb":
             self.model_id = False
 
+    def _compile_rules(self, role_ids):
+        """
+        Index the rules of a set of roles for the role policy snapshot.
+        """
+        rules = self.with_context(active_test=True).search(
+            [("role_id", "in", list(role_ids))]
+        )
+        by_model = {}
+        by_remove = {}
+        for rule in rules:
+            rule_vals = {
+                "id": rule.id,
+                "priority": rule.priority,
+                "element": rule.element,
+                "view_id": rule.view_id.id,
+                "view_type": rule.view_type,
+            }
+            by_model.setdefault((rule.remove, rule.model), []).append(rule_vals)
+            by_remove.setdefault(rule.remove, []).append(rule_vals)
+        return {
+            "ids": tuple(rules.ids),
+            "roles_nbr": len(role_ids),
+            "by_model": by_model,
+            "by_remove": by_remove,
+            "resolved": {},
+        }
+
     def _get_rules(self, model, view_id, view_type=False, remove=False):
         rules = self.browse()
         if config.get("test_enable"):
             return rules
-        signature_fields = self._rule_signature_fields()
-        user_roles = self.env.user.enabled_role_ids or self.env.user.role_ids
-        dom = [
-            ("role_id", "in", user_roles.ids),
-            ("remove", "=", remove),
-        ]
-        if model:
-            dom.append(("model", "=", model))
-        if view_id:
-            dom += ["|", ("view_id", "=", view_id), ("view_id", "=", False)]
-        if view_type:
-            dom += ["|", ("view_type", "=", view_type), ("view_type", "=", False)]
-        all_rules = self.search(dom)
-        rules_dict = {}
-        for rule in all_rules:
-            key = "-".join([str(getattr(rule, f)) for f in signature_fields])
-            if key not in rules_dict:
-                rules_dict[key] = rule
+        snapshot = self.env["res.role"]._get_policy_snapshot()[self._name]
+        key = (model, view_id, view_type, remove)
+        rule_ids = snapshot["resolved"].get(key)
+        if rule_ids is None:
+            if model:
+                candidates = snapshot["by_model"].get((remove, model), [])
             else:
-                rules_dict[key] += rule
-        # Keep only rules with highest priority.
-        # No rule for one of the user roles is considered highest priority
-        roles_nbr = len(user_roles)
-        for key in rules_dict:
-            key_rules = rules_dict[key]
-            if len(key_rules) != roles_nbr:
-                continue
-            rules += key_rules.sorted(lambda r: r.priority)[0]
-        return rules
+                candidates = snapshot["by_remove"].get(remove, [])
+            if view_id:
+                candidates = [r for r in candidates if r["view_id"] in (view_id, False)]
+            if view_type:
+                candidates = [
+                    r for r in candidates if r["view_type"] in (view_type, False)
+                ]
+            rule_ids = tuple(
+                select_rules_by_priority(
+                    candidates, self._rule_signature_fields(), snapshot["roles_nbr"]
+                )
+            )
+            snapshot["resolved"][key] = rule_ids
+        return rules.browse(rule_ids).with_prefetch(snapshot["ids"])
+
+    def _get_rules_by_view(self, model, views, remove=False):
+        """
+        Return the rules for a chain of views.
+
+        :param views: ir.ui.view recordset
+        :return: dict mapping the view ids to their rules, the rules of all views
+                 share the same prefetch set
+        """
+        return {
+            view.id: self._get_rules(
+                model, view.id, view_type=not remove and view.type, remove=remove
+            )
+            for view in views
+        }
 
     def _rule_signature_fields(self):
         return ["element", "view_id", "view_type"]
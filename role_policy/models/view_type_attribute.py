@@ -6,6 +6,8 @@ import logging
 from odoo import api, fields, models
 from odoo.tools import config
 
+from .helpers import select_rules_by_priority
+
 _logger = logging.getLogger(__name__)
 
 
@@ -43,34 +45,66 @@ class ViewTypeAttribute(models.Model):
         comodel_name="res.company", related="role_id.company_id", store=True
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.clear_caches()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
     @api.constrains("view_id", "attrib", "attrib_val")
     def _check_view_attribute(self):
         """TODO: add checks on syntax"""
 
+    def _compile_rules(self, role_ids):
+        """
+        Index the rules of a set of roles for the role policy snapshot.
+        """
+        rules = self.with_context(active_test=True).search(
+            [("role_id", "in", list(role_ids))]
+        )
+        by_view = {}
+        for rule in rules:
+            by_view.setdefault(rule.view_id.id, []).append(
+                {
+                    "id": rule.id,
+                    "priority": rule.priority,
+                    "view_id": rule.view_id.id,
+                    "attrib": rule.attrib,
+                }
+            )
+        return {
+            "ids": tuple(rules.ids),
+            "roles_nbr": len(role_ids),
+            "by_view": by_view,
+            "resolved": {},
+        }
+
     def _get_rules(self, view_id):
         rules = self.browse()
         if config.get("test_enable"):
             return rules
-        signature_fields = self._rule_signature_fields()
-        user_roles = self.env.user.enabled_role_ids or self.env.user.role_ids
-        dom = [("view_id", "=", view_id), ("role_id", "in", user_roles.ids)]
-        all_rules = self.search(dom)
-        rules_dict = {}
-        for rule in all_rules:
-            key = "-".join([str(getattr(rule, f)) for f in signature_fields])
-            if key not in rules_dict:
-                rules_dict[key] = rule
-            else:
-                rules_dict[key] += rule
-        # Keep only rules with highest priority.
-        # No rule for one of the user roles is considered highest priority
-        roles_nbr = len(user_roles)
-        for key in rules_dict:
-            key_rules = rules_dict[key]
-            if len(key_rules) != roles_nbr:
-                continue
-            rules += key_rules.sorted(lambda r: r.priority)[0]
-        return rules
+        snapshot = self.env["res.role"]._get_policy_snapshot()[self._name]
+        rule_ids = snapshot["resolved"].get(view_id)
+        if rule_ids is None:
+            rule_ids = tuple(
+                select_rules_by_priority(
+                    snapshot["by_view"].get(view_id, []),
+                    self._rule_signature_fields(),
+                    snapshot["roles_nbr"],
+                )
+            )
+            snapshot["resolved"][view_id] = rule_ids
+        return rules.browse(rule_ids).with_prefetch(snapshot["ids"])
 
     def _rule_signature_fields(self):
         return ["view_id", "attrib"]
@@ -0,0 +1 @@
+from . import test_role_policy_import
@@ -0,0 +1,53 @@
+# Copyright 2020-2024 Noviat
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import base64
+import io
+import re
+import zipfile
+
+import openpyxl
+import xlrd
+
+from odoo.tests.common import SavepointCase
+
+
+class TestRolePolicyImport(SavepointCase):
+    def _xlsx_without_dimension(self, rows):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for row in rows:
+            ws.append(row)
+        data = io.BytesIO()
+        wb.save(data)
+        src = zipfile.ZipFile(io.BytesIO(data.getvalue()))
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w") as dst:
+            for item in src.infolist():
+                content = src.read(item.filename)
+                if item.filename.startswith("xl/worksheets/"):
+                    content = re.sub(rb"<dimension[^>]*/>", b"", content)
+                dst.writestr(item, content)
+        return out.getvalue()
+
+    def test_xlsx_rows_without_dimension(self):
+        data = self._xlsx_without_dimension(
+            [
+                ["Menu", "External Identifier", "Delete Entry"],
+                ["Settings", "base.menu_administration"],
+                ["Technical"],
+            ]
+        )
+        self.assertNotIn(
+            b"<dimension",
+            zipfile.ZipFile(io.BytesIO(data)).read("xl/worksheets/sheet1.xml"),
+        )
+        wizard = self.env["role.policy.import"].create(
+            {"policy_data": base64.b64encode(data), "file_type": "xlsx"}
+        )
+        sheet = next(wizard._iter_sheets(data, [0]))
+        rows = list(sheet.rows)
+        self.assertEqual([len(cells) for cells in rows], [3, 3, 3])
+        self.assertEqual(rows[1][1].value, "base.menu_administration")
+        self.assertEqual(rows[1][2].ctype, xlrd.XL_CELL_EMPTY)
+        self.assertEqual(rows[2][1].ctype, xlrd.XL_CELL_EMPTY)
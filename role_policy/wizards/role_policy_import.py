@@ -2,16 +2,28 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import base64
+import datetime
+import io
+import itertools
 import logging
 import os
+import re
 import time
+from collections import namedtuple
 
+import openpyxl
 import xlrd
 
 from odoo import _, api, fields, models
+from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+# Cells and sheets are exposed with the xlrd cell types
+# for both the xls and xlsx readers.
+Cell = namedtuple("Cell", ["value", "ctype"])
+Sheet = namedtuple("Sheet", ["name", "rows"])
+
 
 class RolePolicyImport(models.TransientModel):
     _name = "role.policy.import"
@@ -32,6 +44,12 @@ class RolePolicyImport(models.TransientModel):
         help="Specify the Excel sheet."
         "\nIf not specified all sheets will be imported.",
     )
+    dry_run = fields.Boolean(
+        help="Compute the changes without applying them."
+        "\nThe changes can be reviewed and applied afterwards.",
+    )
+    role_id = fields.Many2one(comodel_name="res.role", readonly=True)
+    has_changes = fields.Boolean(readonly=True)
     warning = fields.Text(readonly=True)
     note = fields.Text("Log")
 
@@ -85,10 +103,15 @@ class RolePolicyImport(models.TransientModel):
 
     def role_policy_import(self):
         time_start = time.time()
-        role = self.env["res.role"].browse(self.env.context["active_id"])
-        data = base64.decodestring(self.policy_data)
+        if self.env.context.get("active_model") == "res.role":
+            self.role_id = self.env.context.get("active_id")
+        role = self.role_id
+        data = base64.b64decode(self.policy_data)
+        change_set = {"changes": [], "xml_ids": {}, "role_ids": []}
         if self.file_type in ["xls", "xlsx"]:
-            err_log = self._read_xls(data, role)
+            err_log = self.with_context(
+                role_policy_import_change_set=change_set
+            )._read_xls(data, role)
         else:
             raise NotImplementedError
         if self.warning:
@@ -105,26 +128,227 @@ class RolePolicyImport(models.TransientModel):
                 "context": self.env.context,
             }
 
+        if self.dry_run:
+            self.has_changes = bool(change_set["changes"])
+            diff = self._format_change_set(change_set)
+            self.note = (err_log and err_log + "\n\n") + diff
+            return self._action_import_result()
+
+        self.has_changes = False
+        self._apply_change_set(change_set)
         if err_log:
             self.note = err_log
-            result_view = self.env.ref(
-                "role_policy.role_policy_import_view_form_result"
-            )
-            return {
-                "name": _("Role Policy Import result"),
-                "res_id": self.id,
-                "view_type": "form",
-                "view_mode": "form",
-                "res_model": "role.policy.import",
-                "view_id": result_view.id,
-                "target": "new",
-                "type": "ir.actions.act_window",
-            }
+            return self._action_import_result()
         else:
             import_time = time.time() - time_start
-            _logger.warn("Role %s import time = %.3f seconds", role.name, import_time)
+            _logger.warn(
+                "Role %s import time = %.3f seconds",
+                role.name or "multi-role",
+                import_time,
+            )
             return {"type": "ir.actions.act_window_close"}
 
+    def role_policy_apply(self):
+        """
+        Apply the changes of a dry run.
+        The change set is computed again from the file since the
+        role policies may have been changed after the dry run.
+        """
+        self.ensure_one()
+        self.dry_run = False
+        return self.role_policy_import()
+
+    def _action_import_result(self):
+        result_view = self.env.ref("role_policy.role_policy_import_view_form_result")
+        return {
+            "name": _("Role Policy Import result"),
+            "res_id": self.id,
+            "view_type": "form",
+            "view_mode": "form",
+            "res_model": "role.policy.import",
+            "view_id": result_view.id,
+            "target": "new",
+            "type": "ir.actions.act_window",
+        }
+
+    def _record_changes(
+        self,
+        sheet,
+        role,
+        model,
+        create=None,
+        update=None,
+        unlink=None,
+        field=None,
+        add=None,
+        remove=None,
+    ):
+        """
+        Record the changes of a sheet in the change set of the import.
+
+        :param create: list of vals of the records to create
+        :param update: list of (ids, vals) of the records to update
+        :param unlink: ids of the records to remove
+        :param field: role Many2many field updated with the 'add' and 'remove' ids
+        """
+        if not any([create, update, unlink, add, remove]):
+            return
+        change = {
+            "sheet": sheet.name,
+            "role_id": role.id,
+            "model": model,
+            "create": create or [],
+            "update": [(list(ids), vals) for ids, vals in update or []],
+            "unlink": list(unlink or []),
+            "field": field,
+            "add": list(add or []),
+            "remove": list(remove or []),
+        }
+        change_set = self.env.context.get("role_policy_import_change_set")
+        if change_set is None:
+            self._apply_change_set({"changes": [change], "role_ids": role.ids})
+        else:
+            change_set["changes"].append(change)
+
+    def _apply_change_set(self, change_set):
+        """
+        The records of all sheets and roles are created
+        with a single create call per model.
+        """
+        self._check_change_set(change_set)
+        self = self.with_context(
+            role_policy_import_xml_ids=change_set.get("xml_ids") or {}
+        )
+        changes = change_set["changes"]
+        for change in changes:
+            if change["unlink"]:
+                self.env[change["model"]].browse(change["unlink"]).unlink()
+        to_create = {}
+        for change in changes:
+            if change["create"]:
+                to_create.setdefault(change["model"], []).extend(change["create"])
+        for model, vals_list in to_create.items():
+            self.env[model].create(vals_list)
+        role_updates = {}
+        for change in changes:
+            model = self.env[change["model"]]
+            for ids, vals in change["update"]:
+                model.browse(ids).write(vals)
+            if change["field"]:
+                updates = [(3, x) for x in change["remove"]]
+                updates += [(4, x) for x in change["add"]]
+                if updates:
+                    role_vals = role_updates.setdefault(change["role_id"], {})
+                    role_vals.setdefault(change["field"], []).extend(updates)
+        for role_id, vals in role_updates.items():
+            self.env["res.role"].browse(role_id).write(vals)
+
+    def _role_policy_import_fields(self):
+        """
+        Return the res.role fields updated by the import.
+        """
+        return [
+            "acl_ids",
+            "menu_ids",
+            "act_window_ids",
+            "act_client_ids",
+            "act_server_ids",
+            "act_report_ids",
+            "modifier_rule_ids",
+            "view_type_attribute_ids",
+            "model_operation_ids",
+            "model_method_ids",
+        ]
+
+    def _check_change_set(self, change_set):
+        """
+        Check that the changes only target the role policies
+        of the roles read by the import.
+        """
+        role_fields = self.env["res.role"]._fields
+        rule_models = {}
+        m2m_fields = {}
+        for fld in self._role_policy_import_fields():
+            field = role_fields[fld]
+            if field.type == "one2many":
+                rule_models[field.comodel_name] = field.inverse_name
+            else:
+                m2m_fields[fld] = field.comodel_name
+        role_ids = set(change_set.get("role_ids") or [])
+        for change in change_set["changes"]:
+            role_id = change["role_id"]
+            if role_id not in role_ids:
+                raise UserError(_("Role %s was not read by the import.") % role_id)
+            if change["field"]:
+                if m2m_fields.get(change["field"]) != change["model"]:
+                    raise UserError(
+                        _("Incorrect change set for field '%s'.") % change["field"]
+                    )
+                if change["create"] or change["update"] or change["unlink"]:
+                    raise UserError(
+                        _("Incorrect change set for field '%s'.") % change["field"]
+                    )
+                continue
+            if change["model"] not in rule_models or change["add"] or change["remove"]:
+                raise UserError(
+                    _("Incorrect change set for model '%s'.") % change["model"]
+                )
+            inverse_name = rule_models[change["model"]]
+            if any(vals.get(inverse_name) != role_id for vals in change["create"]):
+                raise UserError(
+                    _("Incorrect change set for model '%s'.") % change["model"]
+                )
+            rule_ids = set(change["unlink"])
+            for ids, vals in change["update"]:
+                if inverse_name in vals:
+                    raise UserError(
+                        _("Incorrect change set for model '%s'.") % change["model"]
+                    )
+                rule_ids.update(ids)
+            rules = self.env[change["model"]].browse(rule_ids).exists()
+            if len(rules) != len(rule_ids) or any(
+                rule[inverse_name].id != role_id for rule in rules
+            ):
+                raise UserError(
+                    _(
+                        "The %s records of role %s have been changed "
+                        "since the file has been read."
+                    )
+                    % (change["model"], role_id)
+                )
+
+    def _format_change_set(self, change_set):
+        if not change_set["changes"]:
+            return _("No changes.")
+        lines = []
+        for change in change_set["changes"]:
+            role = self.env["res.role"].browse(change["role_id"])
+            model = self.env[change["model"]]
+            if lines:
+                lines.append("")
+            lines.append(_("Sheet '%s', Role '%s':") % (change["sheet"], role.code))
+            if change["field"]:
+                lines.append(
+                    _("Add: %s, Remove: %s")
+                    % (len(change["add"]), len(change["remove"]))
+                )
+                lines += ["+ %s" % x.display_name for x in model.browse(change["add"])]
+                lines += [
+                    "- %s" % x.display_name for x in model.browse(change["remove"])
+                ]
+                continue
+            lines.append(
+                _("Create: %s, Update: %s, Delete: %s")
+                % (len(change["create"]), len(change["update"]), len(change["unlink"]))
+            )
+            lines += ["+ %s" % vals for vals in change["create"]]
+            for ids, vals in change["update"]:
+                lines += [
+                    "~ {}: {}".format(x.display_name, vals) for x in model.browse(ids)
+                ]
+            lines += ["- %s" % x.display_name for x in model.browse(change["unlink"])]
+        return "\n".join(lines)
+
     def _read_xls(self, data, role):
         all_sheets = [x[0] for x in self._selection_sheet()]
         if self.sheet:
@@ -133,11 +357,16 @@ class RolePolicyImport(models.TransientModel):
         else:
             sheets = all_sheets
             start = 0
+        indexes = range(start, start + len(sheets))
+        self = self.with_context(self._prepare_lookups(data, sheets, indexes))
         err_log = ""
-        wb = xlrd.open_workbook(file_contents=data)
-        for i, sheet_name in enumerate(sheets, start=start):
-            sheet = wb.sheet_by_index(i)
-            sheet_err_log = getattr(self, "_read_{}".format(sheet_name))(sheet, role)
+        change_set = self.env.context.get("role_policy_import_change_set")
+        if change_set is not None:
+            change_set["xml_ids"] = self.env.context["role_policy_import_xml_ids"]
+            roles = self.env.context["role_policy_import_roles"]
+            change_set["role_ids"] = role.ids + list(roles.values())
+        for sheet_name, sheet in zip(sheets, self._iter_sheets(data, indexes)):
+            sheet_err_log = self._read_sheet(sheet_name, sheet, role)
             if sheet_err_log:
                 if err_log:
                     err_log += "\n\n"
@@ -145,26 +374,258 @@ class RolePolicyImport(models.TransientModel):
                 err_log += "\n\n" + sheet_err_log
         return err_log
 
+    def _read_sheet(self, sheet_name, sheet, role):
+        """
+        Read a sheet for the role of the wizard or, when the first
+        column of the sheet is 'Role', for the roles with the codes of
+        that column. The rows of such a sheet are grouped per role.
+        """
+        read_method = getattr(self, "_read_{}".format(sheet_name))
+        rows = iter(sheet.rows)
+        header_cells = next(rows, [])
+        if not header_cells or header_cells[0].value != "Role":
+            if not role:
+                return _(
+                    "Error while reading sheet '%s':\n"
+                    "The first column of the sheet should contain the role codes."
+                ) % (sheet.name)
+            sheet = Sheet(sheet.name, itertools.chain([header_cells], rows))
+            return read_method(sheet, role)
+        if role:
+            return _(
+                "Error while reading sheet '%s':\n"
+                "A sheet with a 'Role' column can only be imported "
+                "via the 'Import Role Policies' menu entry."
+            ) % (sheet.name)
+
+        role_rows = {}
+        for cells in rows:
+            ln = [c.value for c in cells]
+            if self._empty_line(ln):
+                continue
+            code = self._read_role_code(ln[0])
+            role_rows.setdefault(code, []).append(cells[1:])
+        roles = self.env.context.get("role_policy_import_roles") or {}
+        err_log = ""
+        for code, cells_list in role_rows.items():
+            if code not in roles:
+                role_err_log = _("Role '%s' does not exist.") % code
+            else:
+                role_sheet = Sheet(
+                    sheet.name, itertools.chain([header_cells[1:]], cells_list)
+                )
+                role_err_log = read_method(
+                    role_sheet, self.env["res.role"].browse(roles[code])
+                )
+            if role_err_log:
+                err_log = (err_log and err_log + "\n\n") + _("Role '%s':") % code
+                err_log += "\n\n" + role_err_log
+        return err_log
+
+    def _read_role_code(self, val):
+        if isinstance(val, float) and val % 1 == 0.0:
+            val = int(val)
+        return val and str(val).strip()
+
+    def _sheet_reference_columns(self):
+        """
+        Return per sheet the column indexes with External Identifiers,
+        Models and View Elements with button External Identifiers.
+        """
+        return {
+            "acl": {"model": [1]},
+            "menu": {"xml_id": [1]},
+            "act_window": {"xml_id": [1]},
+            "act_client": {"xml_id": [1]},
+            "act_server": {"xml_id": [1]},
+            "act_report": {"xml_id": [1]},
+            "modifier_rule": {"model": [0], "xml_id": [3], "element": [5]},
+            "view_type_attribute": {"xml_id": [2]},
+        }
+
+    def _prepare_lookups(self, data, sheets, indexes):
+        """
+        Collect the External Identifiers and Models referenced in the
+        sheets and resolve them in batch.
+        The result is passed via the context to the sheet readers.
+        """
+        sheet_columns = self._sheet_reference_columns()
+        xml_ids = set()
+        model_names = set()
+        role_codes = set()
+        for sheet_name, sheet in zip(sheets, self._iter_sheets(data, indexes)):
+            columns = sheet_columns.get(sheet_name) or {}
+            rows = iter(sheet.rows)
+            headerline = self._read_header(rows)
+            # multi-role sheets have an extra 'Role' column
+            role_column = headerline[:1] == ["Role"]
+            if not columns and not role_column:
+                continue
+            for cells in rows:
+                ln = [c.value for c in cells]
+                if self._empty_line(ln):
+                    continue
+                if role_column:
+                    role_codes.add(self._read_role_code(ln[0]))
+                    ln = ln[1:]
+                for key, cis in columns.items():
+                    for ci in cis:
+                        val = ci < len(ln) and ln[ci]
+                        if not val or not isinstance(val, str):
+                            continue
+                        val = val.strip()
+                        if key == "model":
+                            model_names.add(val)
+                        elif key == "xml_id":
+                            xml_ids.add(val)
+                        else:
+                            xml_ids.update(re.findall(r"%\(([^)]+)\)d", val))
+        return {
+            "role_policy_import_xml_ids": self._resolve_xml_ids(xml_ids),
+            "role_policy_import_models": self._resolve_models(model_names),
+            "role_policy_import_roles": self._resolve_roles(role_codes),
+        }
+
+    def _resolve_xml_ids(self, xml_ids):
+        """
+        Return a {xml_id: (model, res_id)} dict
+        with (False, False) for the unresolved External Identifiers.
+        """
+        result = {x: (False, False) for x in xml_ids}
+        keys = tuple(tuple(x.split(".", 1)) for x in xml_ids if "." in x)
+        if not keys:
+            return result
+        imd = self.env["ir.model.data"]
+        imd.flush(["module", "name", "model", "res_id"])
+        self.env.cr.execute(
+            """
+            SELECT module, name, model, res_id
+              FROM ir_model_data
+              WHERE (module, name) IN %s
+            """,
+            (keys,),
+        )
+        res_ids = {}
+        for module, name, model, res_id in self.env.cr.fetchall():
+            if model in self.env:
+                res_ids.setdefault(model, {})[res_id] = "{}.{}".format(module, name)
+        for model, entries in res_ids.items():
+            records = self.env[model].sudo().browse(list(entries)).exists()
+            for res_id in records.ids:
+                result[entries[res_id]] = (model, res_id)
+        return result
+
+    def _resolve_models(self, model_names):
+        if not model_names:
+            return {}
+        model_recs = self.env["ir.model"].search([("model", "in", list(model_names))])
+        return {x.model: x.id for x in model_recs}
+
+    def _resolve_roles(self, role_codes):
+        if not role_codes:
+            return {}
+        roles = self.env["res.role"].search(
+            [
+                ("code", "in", list(role_codes)),
+                ("company_id", "in", [self.env.company.id, False]),
+            ],
+            order="company_id",
+        )
+        result = {}
+        for role in roles:
+            result.setdefault(role.code, role.id)
+        return result
+
+    def _get_model_id(self, model_name):
+        model_ids = self.env.context.get("role_policy_import_models") or {}
+        if model_name in model_ids:
+            return model_ids[model_name]
+        return self.env["ir.model"]._get_id(model_name)
+
+    def _iter_sheets(self, data, indexes):
+        """
+        Yield the sheets with the given indexes.
+        The rows of a sheet are read lazily, one list of Cells per row.
+        """
+        if self.file_type == "xlsx":
+            wb = openpyxl.load_workbook(
+                io.BytesIO(data), read_only=True, data_only=True
+            )
+            try:
+                for i in indexes:
+                    ws = wb.worksheets[i]
+                    yield Sheet(ws.title, self._iter_xlsx_rows(ws))
+            finally:
+                wb.close()
+        else:
+            wb = xlrd.open_workbook(file_contents=data, on_demand=True)
+            try:
+                for i in indexes:
+                    ws = wb.sheet_by_index(i)
+                    yield Sheet(ws.name, (ws.row(ri) for ri in range(ws.nrows)))
+                    wb.unload_sheet(i)
+            finally:
+                wb.release_resources()
+
+    def _iter_xlsx_rows(self, ws):
+        """
+        The sheet dimension is missing or incorrect in files written by
+        many tools other than Excel, hence the rows are read without it
+        and padded to the length of the header row.
+        """
+        ws.reset_dimensions()
+        ncols = None
+        for row in ws.iter_rows():
+            cells = [self._xlsx_cell(c.value) for c in row]
+            if ncols is None:
+                ncols = len(cells)
+            if len(cells) < ncols:
+                cells += [Cell("", xlrd.XL_CELL_EMPTY)] * (ncols - len(cells))
+            yield cells
+
+    def _xlsx_cell(self, value):
+        """
+        Convert an openpyxl cell value into an xlrd compatible Cell.
+        """
+        if value is None:
+            return Cell("", xlrd.XL_CELL_EMPTY)
+        if isinstance(value, str):
+            return Cell(value, xlrd.XL_CELL_TEXT)
+        if isinstance(value, (bool, int, float)):
+            return Cell(float(value), xlrd.XL_CELL_NUMBER)
+        if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+            return Cell(value, xlrd.XL_CELL_DATE)
+        return Cell(str(value), xlrd.XL_CELL_TEXT)
+
+    def _read_header(self, rows):
+        header_cells = next(rows, [])
+        return [c.value for c in header_cells]
+
     def _read_acl(self, sheet, role):
         header = ["Name", "Model", "Read", "Write", "Create", "Delete", "Active"]
-        headerline = sheet.row_values(0)
+        rows = iter(sheet.rows)
+        headerline = self._read_header(rows)
         err_log, unlink_pos, unlink_column = self._check_sheet_header(
             sheet, header, headerline
         )
         if err_log:
             return err_log
 
-        unique_entries = []
+        unique_entries = set()
         to_unlink = self.env["res.role.acl"]
         to_create = []
+        role_acls = {}
+        for acl in role.acl_ids:
+            model_name = acl.model_id.model
+            role_acls[model_name] = role_acls.get(model_name, to_unlink) | acl
 
-        for ri in range(1, sheet.nrows):
-            ln = sheet.row_values(ri)
+        for cells in rows:
+            ln = [c.value for c in cells]
             if self._empty_line(ln):
                 continue
             line_errors = []
             model_name = ln[1].strip()
-            model_id = self.env["ir.model"]._get_id(model_name)
+            model_id = self._get_model_id(model_name)
             if not model_id:
                 line_errors.append(_("Model '%s' does not exist.") % model_name)
                 err_log = (err_log and err_log + "\n\n") + self._format_line_errors(
@@ -174,10 +635,10 @@ class RolePolicyImport(models.TransientModel):
             if model_id in unique_entries:
                 line_errors.append(_("Duplicate entry.") % ln)
             else:
-                unique_entries.append(model_id)
+                unique_entries.add(model_id)
             line_action = False
             vals = {"role_id": role.id, "model_id": model_id}
-            role_acl = role.acl_ids.filtered(lambda r: r.model_id.model == model_name)
+            role_acl = role_acls.get(model_name, self.env["res.role.acl"])
             if unlink_column and self._check_unlink(
                 role_acl, ln[unlink_pos], line_errors
             ):
@@ -198,7 +659,7 @@ class RolePolicyImport(models.TransientModel):
             ):
                 fld = fld[0]
                 column_name = fld[1]
-                val = self._read_cell_bool(sheet.cell(ri, ci), column_name, line_errors)
+                val = self._read_cell_bool(cells[ci], column_name, line_errors)
                 vals[fld] = val
                 if (
                     line_action not in ["create", "delete"]
@@ -216,8 +677,9 @@ class RolePolicyImport(models.TransientModel):
                 )
 
         if not err_log:
-            to_unlink.unlink()
-            self.env["res.role.acl"].create(to_create)
+            self._record_changes(
+                sheet, role, "res.role.acl", create=to_create, unlink=to_unlink.ids
+            )
         return err_log
 
     def _read_menu(self, sheet, role):
@@ -241,7 +703,8 @@ class RolePolicyImport(models.TransientModel):
         return self._read_m2m_sheet(sheet, role, header)
 
     def _read_m2m_sheet(self, sheet, role, header):
-        headerline = sheet.row_values(0)
+        rows = iter(sheet.rows)
+        headerline = self._read_header(rows)
         err_log, unlink_pos, unlink_column = self._check_sheet_header(
             sheet, header, headerline
         )
@@ -253,35 +716,41 @@ class RolePolicyImport(models.TransientModel):
         else:
             fld = "act_" + fld + "_ids"
         rules = getattr(role, fld)
+        rules_by_id = {x.id: x for x in rules}
 
-        unique_entries = []
+        unique_entries = set()
         to_remove_ids = []
         to_add_ids = []
 
-        for ri in range(1, sheet.nrows):
-            ln = sheet.row_values(ri)
+        for cells in rows:
+            ln = [c.value for c in cells]
             if self._empty_line(ln):
                 continue
             line_errors = []
             fld_id = self._read_xml_id(ln[1], line_errors)
-            rule = rules.filtered(lambda r: r.id == fld_id)
+            rule = rules_by_id.get(fld_id, rules.browse())
             if unlink_column and self._check_unlink(rule, ln[unlink_pos], line_errors):
                 to_remove_ids.append(fld_id)
-            if fld_id not in rules.ids:
+            if not rule:
                 to_add_ids.append(fld_id)
             if fld_id in unique_entries:
                 line_errors.append(_("Duplicate entry.") % ln)
             else:
-                unique_entries.append(fld_id)
+                unique_entries.add(fld_id)
             if line_errors:
                 if err_log:
                     err_log += "\n\n"
                 err_log += self._format_line_errors(ln, line_errors)
 
-        if not err_log:
-            updates = [(3, x) for x in to_remove_ids] + [(4, x) for x in to_add_ids]
-            if updates:
-                setattr(role, fld, updates)
+        if not err_log and (to_remove_ids or to_add_ids):
+            self._record_changes(
+                sheet,
+                role,
+                rules._name,
+                field=fld,
+                add=to_add_ids,
+                remove=to_remove_ids,
+            )
 
         return err_log
 
@@ -324,6 +793,23 @@ class RolePolicyImport(models.TransientModel):
     def _check_modifier_rule_vals(self, vals, line_errors):
         if not vals.get("model_id") and vals.get("view_type") != "qweb":
             line_errors.append(_("Model definition error."))
+        if vals.get("element_ui"):
+            self._check_modifier_rule_element(vals, line_errors)
+
+    def _check_modifier_rule_element(self, vals, line_errors):
+        """
+        Resolve and check the element as done when the rule is created
+        in order to report the element errors as line errors.
+        """
+        rule = self.env["view.modifier.rule"].new(
+            {"element_ui": vals["element_ui"], "remove": vals.get("remove")}
+        )
+        element_errors = []
+        element = rule._resolve_rule_element(element_errors)
+        if element and not element_errors:
+            rule.element = element
+            rule._check_element_syntax(element_errors)
+        line_errors.extend(element_errors)
 
     def _read_view_type_attribute(self, sheet, role):
         fields_dict = {
@@ -405,21 +891,29 @@ class RolePolicyImport(models.TransientModel):
         match_fields = [
             fields_dict[f]["field"] for f in fields_dict if fields_dict[f].get("match")
         ]
-        headerline = sheet.row_values(0)
+        rows = iter(sheet.rows)
+        headerline = self._read_header(rows)
         err_log, unlink_pos, unlink_column = self._check_sheet_header(
             sheet, header, headerline
         )
-        rule_model = getattr(role, role_field)._name
+        rules = getattr(role, role_field)
+        rule_model = rules._name
         if err_log:
             return err_log
 
-        unique_entries = []
+        # index the existing rules by match key
+        rules_index = {}
+        for rule in rules:
+            match_key = self._rule_match_key(rule, match_fields)
+            rules_index[match_key] = rules_index.get(match_key, rules.browse()) | rule
+
+        unique_entries = set()
         to_unlink = self.env[rule_model]
         to_create = []
         to_update = []
 
-        for ri in range(1, sheet.nrows):
-            ln = sheet.row_values(ri)
+        for cells in rows:
+            ln = [c.value for c in cells]
             if self._empty_line(ln):
                 continue
             vals = {"role_id": role.id}
@@ -433,9 +927,7 @@ class RolePolicyImport(models.TransientModel):
                     line_errors.append(_("Missing value for field '%s'.") % header_fld)
                     continue
                 method = fields_dict[header_fld]["method"]
-                vals[fld] = getattr(self, method)(
-                    sheet.cell(ri, ci), header_fld, line_errors
-                )
+                vals[fld] = getattr(self, method)(cells[ci], header_fld, line_errors)
 
             check_vals_method = "_check_{}_vals".format(role_field[:-4])
             getattr(self, check_vals_method)(vals, line_errors)
@@ -443,41 +935,66 @@ class RolePolicyImport(models.TransientModel):
             if match_key in unique_entries:
                 line_errors.append(_("Duplicate entry.") % ln)
             else:
-                unique_entries.append(match_key)
+                unique_entries.add(match_key)
             if line_errors:
                 err_log = (err_log and err_log + "\n\n") + self._format_line_errors(
                     ln, line_errors
                 )
                 continue
 
-            def rule_filter(rule):
-                rule_key_fields = []
-                for f in match_fields:
-                    val = getattr(rule, f)
-                    if hasattr(val, "id"):
-                        val = val.id
-                    rule_key_fields.append(str(val))
-                rule_key = "-".join(rule_key_fields)
-                return rule_key == match_key
-
-            rule = getattr(role, role_field).filtered(rule_filter)
+            rule = rules_index.get(match_key, rules.browse())
 
             if unlink_column and self._check_unlink(rule, ln[unlink_pos], line_errors):
                 to_unlink += rule
             elif rule:
-                upd_vals = {k: v for k, v in vals.items() if k not in match_fields}
-                to_update.append((rule, upd_vals))
+                upd_vals = self._get_rule_updates(
+                    rule, {k: v for k, v in vals.items() if k not in match_fields}
+                )
+                if upd_vals:
+                    to_update.append((rule, upd_vals))
             else:
                 to_create.append(vals)
 
         if not err_log:
-            to_unlink.unlink()
-            self.env[rule_model].create(to_create)
-            for rule, vals in to_update:
-                rule.update(vals)
+            self._record_changes(
+                sheet,
+                role,
+                rule_model,
+                create=to_create,
+                update=[(rule.ids, vals) for rule, vals in to_update],
+                unlink=to_unlink.ids,
+            )
 
         return err_log
 
+    def _get_rule_updates(self, rules, vals):
+        """
+        Return the vals which differ from the values of the existing rules.
+        """
+        upd_vals = {}
+        for fld, val in vals.items():
+            field = rules._fields[fld]
+            for rule in rules:
+                try:
+                    new_val = field.convert_to_record(
+                        field.convert_to_cache(val, rule), rule
+                    )
+                except ValueError:
+                    new_val = val
+                if rule[fld] != new_val:
+                    upd_vals[fld] = val
+                    break
+        return upd_vals
+
+    def _rule_match_key(self, rule, match_fields):
+        rule_key_fields = []
+        for f in match_fields:
+            val = getattr(rule, f)
+            if hasattr(val, "id"):
+                val = val.id
+            rule_key_fields.append(str(val))
+        return "-".join(rule_key_fields)
+
     def _check_sheet_header(self, sheet, header, headerline):
         err_log = ""
         unlink_pos = len(header)
@@ -528,7 +1045,7 @@ class RolePolicyImport(models.TransientModel):
         if not val:
             return False
         if cell.ctype == xlrd.XL_CELL_TEXT:
-            model_name = self.env["ir.model"]._get_id(val.strip()) or False
+            model_name = self._get_model_id(val.strip()) or False
         else:
             line_errors.append(
                 _("Incorrect value '%s' for field '%s'. ") % (val, column_name)
@@ -624,10 +1141,15 @@ class RolePolicyImport(models.TransientModel):
         return val
 
     def _read_xml_id(self, val, line_errors):
-        rec = self.env.ref(val, raise_if_not_found=False)
-        if not rec:
+        xml_ids = self.env.context.get("role_policy_import_xml_ids") or {}
+        if val in xml_ids:
+            res_id = xml_ids[val][1]
+        else:
+            rec = self.env.ref(val, raise_if_not_found=False)
+            res_id = rec and rec.id
+        if not res_id:
             line_errors.append(_("Incorrect value for field 'External Identifier'."))
-        return rec and rec.id or False
+        return res_id or False
 
     def _format_line_errors(self, ln, line_errors):
         err_log = _("Error while processing line %s:\n") % ln
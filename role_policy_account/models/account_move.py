@@ -3,14 +3,14 @@
 
 from odoo import models
 
+from odoo.addons.role_policy.models.model_method_execution_right import (
+    method_execution_right,
+)
+
 
 class AccountMove(models.Model):
     _inherit = "account.move"
 
+    @method_execution_right("account.move,post")
     def post(self):
-        self.env["model.method.execution.right"].check_right(
-            "account.move,post", raise_exception=True
-        )
-        ctx = dict(self.env.context, role_policy_has_groups_ok=True)
-        self = self.with_context(ctx)
         return super().post()
@@ -8,10 +8,7 @@ class ProductProduct(models.Model):
     _inherit = "product.product"
 
     def _compute_sales_count(self):
-        sale_report_group_ids = self.env["ir.model.access"]._get_acl_access_group_ids(
-            "sale.report", "r"
-        )
-        if not any([x in sale_report_group_ids for x in self.env.user.groups_id.ids]):
+        if not self.env["ir.model.access"]._user_has_acl_access("sale.report", "r"):
             self.sales_count = 0
             return {}
         else: